@@ -0,0 +1,230 @@
+import pickle
+from collections import OrderedDict
+from LL1Parser import LL1Parser
+
+
+class AdaptiveLLParser(LL1Parser):
+    # LL(1) entries stay in parse_table and cost one lookup. Conflicting (nt, token)
+    # decisions are resolved by simulating the alternatives ahead (SLL first, full
+    # parser-stack context only when SLL cannot decide) and the resulting lookahead
+    # DFA is cached per decision. The grammar must not be left-recursive.
+    ERROR = -1
+
+    def __init__(self, grammar, cache_size=10000, max_closure_depth=1000):
+        self.conflicts = {}
+        self.cache_size = cache_size  # 所有决策的 DFA 状态总数上限
+        self.max_closure_depth = max_closure_depth
+        self.dfa_cache = OrderedDict()  # (nt, token) -> DFA，按最近使用排序
+        self.dfa_state_count = 0
+        super().__init__(grammar)
+
+    def build_table_row(self, nt):
+        row = {}
+        for key in [key for key in self.conflicts if key[0] == nt]:
+            del self.conflicts[key]
+        for prod in self.grammar.get_productions_for(nt):
+            first_alpha = self.compute_string_first(prod[1])
+            lookaheads = first_alpha - {'ε'}
+            if 'ε' in first_alpha:
+                lookaheads |= self.follow[nt]
+            for terminal in lookaheads:
+                if (nt, terminal) in self.conflicts:
+                    self.conflicts[(nt, terminal)].append(prod)
+                elif terminal in row:
+                    self.conflicts[(nt, terminal)] = [row.pop(terminal), prod]
+                else:
+                    row[terminal] = prod
+        return row
+
+    def refresh(self):
+        rows = super().refresh()
+        if rows:
+            # 前看 DFA 的闭包会展开任意非终结符，文法一变就整体作废
+            self.dfa_cache.clear()
+            self.dfa_state_count = 0
+        return rows
+
+    def compile(self):
+        # 冲突决策依赖运行时不断增长的 DFA 缓存，无法编译成只读表
+        if self.conflicts:
+            raise ValueError("Grammar is not LL(1), adaptive prediction cannot be compiled to shared tables")
+        return super().compile()
+
+    def parse(self, input_tokens):
+        input_tokens = input_tokens + ['$']
+        stack = ['$', self.grammar.start_symbol]
+        pos = 0
+
+        while stack:
+            top = stack[-1]
+            current_token = input_tokens[pos]
+
+            if top in self.grammar.terminals or top == '$':
+                if top == current_token:
+                    stack.pop()
+                    pos += 1
+                else:
+                    raise SyntaxError(f"Expected {top}, got {current_token}")
+            elif top in self.grammar.non_terminals:
+                production = self.parse_table[top].get(current_token)
+                if production is None:
+                    if (top, current_token) not in self.conflicts:
+                        raise SyntaxError(f"No production for {top} on {current_token}")
+                    production = self.predict(top, input_tokens, pos, stack)
+                stack.pop()
+                if production[1] != ['ε']:
+                    stack.extend(reversed(production[1]))
+            else:
+                raise SyntaxError(f"Invalid symbol {top} on stack")
+
+        if pos != len(input_tokens):
+            raise SyntaxError("Input not fully consumed")
+        return True
+
+    def predict(self, nt, input_tokens, pos, stack):
+        decision = (nt, input_tokens[pos])
+        alternatives = self.conflicts[decision]
+        dfa = self._get_dfa(decision, alternatives)
+
+        state = 0
+        i = pos
+        while True:
+            if state in dfa['accept']:
+                return alternatives[dfa['accept'][state]]
+            if state in dfa['full_context']:
+                return alternatives[self._predict_full_context(alternatives, input_tokens, pos, stack)]
+            if i == len(input_tokens):
+                raise SyntaxError(f"No viable alternative for {nt} at position {pos}")
+
+            token = input_tokens[i]
+            next_state = dfa['edges'].get((state, token))
+            if next_state is None:
+                configs = self._closure(self._move(dfa['configs'][state], token))
+                next_state = self._add_dfa_state(dfa, configs) if configs else self.ERROR
+                if next_state is None:
+                    # 缓存已满：从这里开始直接用配置集模拟，不再增加 DFA 状态
+                    return alternatives[self._predict_uncached(alternatives, configs, input_tokens, i + 1, pos, stack)]
+                dfa['edges'][(state, token)] = next_state
+            if next_state == self.ERROR:
+                raise SyntaxError(f"No viable alternative for {nt} at position {pos}")
+            state = next_state
+            i += 1
+
+    def _get_dfa(self, decision, alternatives):
+        dfa = self.dfa_cache.get(decision)
+        if dfa is not None:
+            self.dfa_cache.move_to_end(decision)
+            return dfa
+
+        self._evict()
+        dfa = {'ids': {}, 'configs': [], 'edges': {}, 'accept': {}, 'full_context': set()}
+        self._add_dfa_state(dfa, self._closure(
+            {(alt, self._push(prod[1], None)) for alt, prod in enumerate(alternatives)}))
+        self.dfa_cache[decision] = dfa
+        return dfa
+
+    def _add_dfa_state(self, dfa, configs):
+        # 返回状态编号；缓存满且淘汰其它决策后仍放不下时返回 None（每个 DFA 的开始状态总是保留）
+        state = dfa['ids'].get(configs)
+        if state is not None:
+            return state
+        if dfa['configs'] and self.dfa_state_count >= self.cache_size:
+            self._evict(keep=dfa)
+            if self.dfa_state_count >= self.cache_size:
+                return None
+        state = len(dfa['configs'])
+        dfa['ids'][configs] = state
+        dfa['configs'].append(configs)
+        self.dfa_state_count += 1
+
+        alts = {alt for alt, _ in configs}
+        if len(alts) == 1:
+            dfa['accept'][state] = alts.pop()
+        elif any(rest is None for _, rest in configs):
+            # SLL 已走出该非终结符仍无法区分，需要用真实的分析栈作为上下文
+            dfa['full_context'].add(state)
+        return state
+
+    def _evict(self, keep=None):
+        # 按最近使用顺序淘汰其它决策的 DFA，直到总状态数低于上限；keep 是正在使用的 DFA，位于最后
+        while self.dfa_cache and self.dfa_state_count >= self.cache_size:
+            decision, oldest = next(iter(self.dfa_cache.items()))
+            if oldest is keep:
+                break
+            del self.dfa_cache[decision]
+            self.dfa_state_count -= len(oldest['configs'])
+
+    def _predict_uncached(self, alternatives, configs, input_tokens, i, pos, stack):
+        while True:
+            alts = {alt for alt, _ in configs}
+            if len(alts) == 1:
+                return alts.pop()
+            if any(rest is None for _, rest in configs):
+                return self._predict_full_context(alternatives, input_tokens, pos, stack)
+            if i == len(input_tokens):
+                raise SyntaxError(f"No viable alternative at position {pos}")
+            configs = self._closure(self._move(configs, input_tokens[i]))
+            if not configs:
+                raise SyntaxError(f"No viable alternative at position {pos}")
+            i += 1
+
+    def _predict_full_context(self, alternatives, input_tokens, pos, stack):
+        context = None
+        for symbol in stack[:-1]:
+            context = (symbol, context)
+        configs = self._closure(
+            {(alt, self._push(prod[1], context)) for alt, prod in enumerate(alternatives)})
+
+        i = pos
+        while i < len(input_tokens):
+            alts = {alt for alt, _ in configs}
+            if len(alts) == 1:
+                return alts.pop()
+            configs = self._closure(self._move(configs, input_tokens[i]))
+            i += 1
+        alts = {alt for alt, _ in configs}
+        if not alts:
+            raise SyntaxError(f"No viable alternative at position {pos}")
+        # 输入读完仍有多个可行的候选，文法在此处二义，取最先出现的产生式
+        return min(alts)
+
+    def _closure(self, configs):
+        result = set()
+        todo = [(alt, stack, 0) for alt, stack in configs]
+        while todo:
+            alt, stack, depth = todo.pop()
+            if stack is not None and stack[0] in self.grammar.non_terminals:
+                if depth > self.max_closure_depth:
+                    raise ValueError("Prediction does not terminate, is the grammar left-recursive?")
+                for prod in self.grammar.get_productions_for(stack[0]):
+                    todo.append((alt, self._push(prod[1], stack[1]), depth + 1))
+            elif (alt, stack) not in result:
+                result.add((alt, stack))
+        return frozenset(result)
+
+    @staticmethod
+    def _move(configs, token):
+        return {(alt, stack[1]) for alt, stack in configs if stack is not None and stack[0] == token}
+
+    @staticmethod
+    def _push(symbols, stack):
+        # 栈用 (symbol, rest) 链表表示，不同配置之间共享公共后缀
+        for symbol in reversed(symbols):
+            if symbol != 'ε':
+                stack = (symbol, stack)
+        return stack
+
+    def save_dfa_cache(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump({'grammar': self._grammar_key(), 'dfa_cache': self.dfa_cache}, f)
+
+    def load_dfa_cache(self, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data['grammar'] != self._grammar_key():
+            raise ValueError("DFA cache was built for a different grammar")
+        self.dfa_cache = data['dfa_cache']
+        self.dfa_state_count = sum(len(dfa['configs']) for dfa in self.dfa_cache.values())
+
+    def _grammar_key(self):
+        return self.grammar.start_symbol, [(lhs, list(rhs)) for lhs, rhs in self.grammar.productions]
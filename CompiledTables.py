@@ -0,0 +1,193 @@
+# 各分析器的 compile() 把构造好的表编译成这里的只读对象，可在多线程间共享；
+# 每次分析的状态放在 tables.session() 返回的会话里，或直接调用 tables.parse()
+from types import MappingProxyType
+
+
+class _Frozen:
+    # 构造完成后禁止再赋值，保证多个线程共享同一份表时不需要加锁
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class LRTables(_Frozen):
+    # LR 系列分析器（LR(0)/SLR(1)/LR(1)/LALR(1)）编译后的只读动作表和 goto 表
+    __slots__ = ('name', 'action_table', 'goto_table')
+
+    def __init__(self, name, action_table, goto_table):
+        actions = {}
+        for key, action in action_table.items():
+            if action[0] == 'reduce':
+                lhs, rhs = action[1]
+                action = ('reduce', (lhs, tuple(rhs)), len(rhs) if list(rhs) != ['ε'] else 0)
+            actions[key] = action
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'action_table', MappingProxyType(actions))
+        object.__setattr__(self, 'goto_table', MappingProxyType(dict(goto_table)))
+
+    @classmethod
+    def from_parser(cls, parser):
+        return cls(type(parser).__name__, parser.action_table, parser.goto_table)
+
+    def session(self):
+        return LRParseSession(self)
+
+    def parse(self, input_tokens):
+        return LRParseSession(self).parse(input_tokens)
+
+
+class LRParseSession:
+    # 一次分析的全部可变状态都在这里，每个线程/每次分析各用一个
+    __slots__ = ('tables', 'stack', 'pos')
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.stack = [0]
+        self.pos = 0
+
+    def parse(self, input_tokens):
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        input_tokens = list(input_tokens) + ['$']
+        self.stack = stack = [0]
+        pos = 0
+
+        while True:
+            state = stack[-1]
+            current_token = input_tokens[pos]
+
+            action = action_table.get((state, current_token))
+            if action is None:
+                self.pos = pos
+                raise SyntaxError(f"No action for state {state} on {current_token}")
+
+            if action[0] == 'shift':
+                stack.append(action[1])
+                pos += 1
+            elif action[0] == 'reduce':
+                lhs = action[1][0]
+                if action[2]:
+                    del stack[-action[2]:]
+                state = stack[-1]
+                goto_key = (state, lhs)
+                if goto_key not in goto_table:
+                    self.pos = pos
+                    raise SyntaxError(f"No goto for state {state} on {lhs}")
+                stack.append(goto_table[goto_key])
+            elif action[0] == 'accept':
+                self.pos = pos
+                return True
+            else:
+                self.pos = pos
+                raise SyntaxError("Invalid action")
+
+
+    # 推送式接口：数据到达一个词法单元就分析一个，供异步服务逐块喂入
+    def reset(self):
+        self.stack = [0]
+        self.pos = 0
+
+    def feed(self, token):
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        stack = self.stack
+
+        while True:
+            state = stack[-1]
+            action = action_table.get((state, token))
+            if action is None:
+                raise SyntaxError(f"No action for state {state} on {token}")
+
+            if action[0] == 'shift':
+                stack.append(action[1])
+                self.pos += 1
+                return False
+            elif action[0] == 'reduce':
+                lhs = action[1][0]
+                if action[2]:
+                    del stack[-action[2]:]
+                state = stack[-1]
+                goto_key = (state, lhs)
+                if goto_key not in goto_table:
+                    raise SyntaxError(f"No goto for state {state} on {lhs}")
+                stack.append(goto_table[goto_key])
+            elif action[0] == 'accept':
+                return True
+            else:
+                raise SyntaxError("Invalid action")
+
+    def finish(self):
+        return self.feed('$')
+
+
+class LLTables(_Frozen):
+    # LL(1) 分析器编译后的只读预测分析表
+    __slots__ = ('start_symbol', 'terminals', 'non_terminals', 'parse_table')
+
+    def __init__(self, start_symbol, terminals, parse_table):
+        rows = {}
+        for nt, row in parse_table.items():
+            rows[nt] = MappingProxyType({
+                terminal: tuple(s for s in prod[1] if s != 'ε')[::-1] for terminal, prod in row.items()
+            })
+        object.__setattr__(self, 'start_symbol', start_symbol)
+        object.__setattr__(self, 'terminals', frozenset(terminals) | {'$'})
+        object.__setattr__(self, 'non_terminals', frozenset(rows))
+        object.__setattr__(self, 'parse_table', MappingProxyType(rows))
+
+    @classmethod
+    def from_parser(cls, parser):
+        return cls(parser.grammar.start_symbol, parser.grammar.terminals, parser.parse_table)
+
+    def session(self):
+        return LLParseSession(self)
+
+    def parse(self, input_tokens):
+        return LLParseSession(self).parse(input_tokens)
+
+
+class LLParseSession:
+    __slots__ = ('tables', 'stack', 'pos')
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.stack = ['$', tables.start_symbol]
+        self.pos = 0
+
+    def parse(self, input_tokens):
+        parse_table = self.tables.parse_table
+        terminals = self.tables.terminals
+        input_tokens = list(input_tokens) + ['$']
+        self.stack = stack = ['$', self.tables.start_symbol]
+        pos = 0
+
+        while stack:
+            top = stack[-1]
+            current_token = input_tokens[pos]
+
+            if top in terminals:
+                if top == current_token:
+                    stack.pop()
+                    pos += 1
+                else:
+                    self.pos = pos
+                    raise SyntaxError(f"Expected {top}, got {current_token}")
+            elif top in parse_table:
+                body = parse_table[top].get(current_token)
+                if body is None:
+                    self.pos = pos
+                    raise SyntaxError(f"No production for {top} on {current_token}")
+                stack.pop()
+                stack.extend(body)
+            else:
+                self.pos = pos
+                raise SyntaxError(f"Invalid symbol {top} on stack")
+
+        self.pos = pos
+        if pos != len(input_tokens):
+            raise SyntaxError("Input not fully consumed")
+        return True
@@ -0,0 +1,327 @@
+from SLR1Parser import SLR1Parser
+
+
+class _Recovery:
+    # 两种恢复共用的部分：出错时先在有限的代价内尝试删除/插入/替换一个词法单元，
+    # 用后面 check_distance 个词法单元验证修复是否可行；都不行再进入恐慌模式。
+    # 每次尝试最多模拟 trial_steps 步、每个错误最多尝试 max_trials 次，单个错误的恢复时间有上限。
+    # 合法输入只走与普通 parse 相同的快速循环，恢复代码一次都不会执行。
+    COSTS = {'delete': 1, 'insert': 1, 'replace': 2}
+
+    def __init__(self, max_cost=2, check_distance=3, max_trials=32, trial_steps=100):
+        self.max_cost = max_cost
+        self.check_distance = check_distance
+        self.max_trials = max_trials
+        self.trial_steps = trial_steps
+
+    def _repair(self, stack, tokens, pos, expected):
+        # 按代价从低到高尝试，第一个能继续分析 check_distance 个词法单元的修复即被采用
+        ahead = tokens[pos + 1:pos + 1 + self.check_distance]
+        token = tokens[pos]
+        candidates = []
+        if token != '$':
+            candidates.append((self.COSTS['delete'], ('delete',), ahead))
+        for t in expected:
+            if t != '$':
+                candidates.append((self.COSTS['insert'], ('insert', t), [t, token] + ahead[:-1]))
+                if token != '$':
+                    candidates.append((self.COSTS['replace'], ('replace', t), [t] + ahead))
+        candidates.sort(key=lambda c: c[0])
+
+        for cost, repair, sequence in candidates[:self.max_trials]:
+            if cost > self.max_cost:
+                break
+            if self._trial(stack, sequence):
+                return repair
+        return None
+
+    def _apply(self, stack, tokens, pos, repair):
+        # 把修复作用到真实的栈上，返回新的输入位置
+        if repair[0] == 'delete':
+            return pos + 1
+        self._consume(stack, repair[1])
+        return pos if repair[0] == 'insert' else pos + 1
+
+    def _error(self, errors, cascade, pos, token, expected, message, recovery):
+        if cascade:
+            # 上次恐慌恢复后一个词法单元都还没读进就又出错，算作同一个错误，只累计丢弃的个数
+            previous = errors[-1]['recovery']
+            if recovery is not None and recovery[0] == 'panic' and previous[0] == 'panic':
+                errors[-1]['recovery'] = ('panic', previous[1] + recovery[1])
+            return
+        errors.append({'pos': pos, 'token': token, 'expected': tuple(expected),
+                       'message': message, 'recovery': recovery})
+
+
+class RecoveringLRParser(_Recovery):
+    # 为 LR(0)/SLR(1)/LR(1)/LALR(1) 分析器加上错误恢复，一遍分析收集所有错误。
+    # 恐慌模式的同步：从栈顶往下找状态 s 和非终结符 A，使当前词法单元 a ∈ FOLLOW(A) 且 goto(s, A) 上 a 有动作，
+    # 找不到就丢弃 a 再找；然后弹到 s、压入 goto(s, A)，相当于把出错的片段当作一个 A
+    def __init__(self, parser, **options):
+        super().__init__(**options)
+        self.tables = parser.compile()
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        non_terminals = parser.grammar.non_terminals
+        # FOLLOW 沿用 SLR1Parser.compute_follow，它只用到 grammar 和 compute_first；
+        # LR(0) 分析器不求 FIRST，而 LR(0) 文法一定是 SLR(1) 文法，就借一个 SLR1Parser
+        source = parser if hasattr(parser, 'compute_first') else SLR1Parser(parser.grammar)
+        follow = SLR1Parser.compute_follow(source)
+
+        self.expected = {}  # 状态 -> 有动作的终结符
+        for state, terminal in action_table:
+            self.expected.setdefault(state, []).append(terminal)
+        for terminals in self.expected.values():
+            terminals.sort()
+
+        self.sync = {}  # 状态 -> {同步符号: 压入的 goto 状态}
+        for (state, symbol), target in sorted(goto_table.items()):
+            if symbol not in non_terminals:
+                continue
+            row = self.sync.setdefault(state, {})
+            for terminal in follow[symbol]:
+                if (target, terminal) in action_table:
+                    row.setdefault(terminal, target)
+        self.sync_tokens = frozenset(t for row in self.sync.values() for t in row)  # 不在其中的词法单元丢弃时不必查栈
+
+    def parse(self, input_tokens):
+        """返回错误列表，合法输入返回空列表。每个错误是一个 dict：
+        pos、token、expected（该处可接受的终结符）、message、recovery（采用的修复或 ('panic', 丢弃的个数)）"""
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        tokens = list(input_tokens) + ['$']
+        stack = [0]
+        pos = 0
+        errors = []
+        last_panic = -1
+
+        while True:
+            state = stack[-1]
+            current_token = tokens[pos]
+
+            action = action_table.get((state, current_token))
+            if action is None:
+                pos, panic = self._recover(stack, tokens, pos, errors, pos == last_panic,
+                                           f"No action for state {state} on {current_token}")
+                if pos is None:
+                    return errors
+                if panic:
+                    last_panic = pos
+                continue
+
+            if action[0] == 'shift':
+                stack.append(action[1])
+                pos += 1
+            elif action[0] == 'reduce':
+                lhs = action[1][0]
+                if action[2]:
+                    del stack[-action[2]:]
+                state = stack[-1]
+                goto_key = (state, lhs)
+                if goto_key not in goto_table:
+                    # 表是按文法构造的，正常情况下不会发生；没有可恢复的依据，直接结束
+                    self._error(errors, False, pos, current_token, (), f"No goto for state {state} on {lhs}", None)
+                    return errors
+                stack.append(goto_table[goto_key])
+            else:
+                return errors
+
+    def _recover(self, stack, tokens, pos, errors, cascade, message):
+        # 返回 (新的输入位置, 是否用了恐慌模式)；位置为 None 表示无法继续
+        token = tokens[pos]
+        expected = self.expected.get(stack[-1], ())
+        repair = self._repair(stack, tokens, pos, expected)
+        if repair is not None:
+            self._error(errors, cascade, pos, token, expected, message, repair)
+            return self._apply(stack, tokens, pos, repair), False
+
+        start = pos
+        if cascade:
+            # 恐慌恢复后在同一位置又出错，先丢弃这个词法单元，保证前进
+            if token == '$':
+                self._error(errors, cascade, pos, token, expected, message, ('panic', 0))
+                return None, True
+            pos += 1
+        # 同步符号 -> 栈中最靠上能同步它的位置。丢弃词法单元时栈不变，所以按需从栈顶往下扫描并记住结果，
+        # 一次恐慌恢复最多扫描一遍栈，丢弃的个数再多也是线性时间
+        depths = {}
+        scanned = len(stack)
+        while True:
+            current_token = tokens[pos]
+            if current_token in self.sync_tokens:
+                i = depths.get(current_token)
+                while i is None and scanned:
+                    scanned -= 1
+                    for terminal in self.sync.get(stack[scanned], ()):
+                        depths.setdefault(terminal, scanned)
+                    i = depths.get(current_token)
+                if i is not None:
+                    target = self.sync[stack[i]][current_token]
+                    del stack[i + 1:]
+                    stack.append(target)
+                    self._error(errors, cascade, start, token, expected, message, ('panic', pos - start))
+                    return pos, True
+            if current_token == '$':
+                self._error(errors, cascade, start, token, expected, message, ('panic', pos - start))
+                return None, True
+            pos += 1
+
+    def _trial(self, stack, sequence):
+        # 在栈的虚拟副本上分析 sequence：只记录弹到的深度 base 和新压入的 extra，不复制整个栈
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        base = len(stack)
+        extra = []
+        steps = 0
+        for token in sequence:
+            while True:
+                steps += 1
+                if steps > self.trial_steps:
+                    return False
+                state = extra[-1] if extra else stack[base - 1]
+                action = action_table.get((state, token))
+                if action is None:
+                    return False
+                if action[0] == 'shift':
+                    extra.append(action[1])
+                    break
+                if action[0] == 'accept':
+                    return True
+                n = action[2]
+                if n > len(extra):
+                    base -= n - len(extra)
+                    extra = []
+                elif n:
+                    del extra[-n:]
+                state = extra[-1] if extra else stack[base - 1]
+                target = goto_table.get((state, action[1][0]))
+                if target is None:
+                    return False
+                extra.append(target)
+        return True
+
+    def _consume(self, stack, token):
+        action_table = self.tables.action_table
+        goto_table = self.tables.goto_table
+        while True:
+            action = action_table[(stack[-1], token)]
+            if action[0] == 'shift':
+                stack.append(action[1])
+                return
+            if action[2]:
+                del stack[-action[2]:]
+            stack.append(goto_table[(stack[-1], action[1][0])])
+
+
+class RecoveringLLParser(_Recovery):
+    # 为 LL1Parser 加上错误恢复。恐慌模式：栈顶终结符不匹配时当作漏写弹出；
+    # 栈顶非终结符 A 没有表项时丢弃输入，直到遇到能展开 A 的符号或 FOLLOW(A) 中的同步符号，后者弹出 A
+    def __init__(self, parser, **options):
+        super().__init__(**options)
+        self.tables = parser.compile()
+        self.follow = {nt: frozenset(f) for nt, f in parser.follow.items()}
+
+    def parse(self, input_tokens):
+        """返回错误列表，格式同 RecoveringLRParser.parse"""
+        parse_table = self.tables.parse_table
+        terminals = self.tables.terminals
+        tokens = list(input_tokens) + ['$']
+        stack = ['$', self.tables.start_symbol]
+        pos = 0
+        errors = []
+        last_panic = -1
+
+        while stack:
+            top = stack[-1]
+            current_token = tokens[pos]
+
+            if top in terminals:
+                if top == current_token:
+                    stack.pop()
+                    pos += 1
+                    continue
+                message = f"Expected {top}, got {current_token}"
+            else:
+                body = parse_table[top].get(current_token)
+                if body is not None:
+                    stack.pop()
+                    stack.extend(body)
+                    continue
+                message = f"No production for {top} on {current_token}"
+            pos, panic = self._recover(stack, tokens, pos, errors, pos == last_panic, message)
+            if panic:
+                last_panic = pos
+
+        return errors
+
+    def _expected(self, top):
+        if top in self.tables.terminals:
+            return (top,)
+        return tuple(sorted(self.tables.parse_table[top]))
+
+    def _recover(self, stack, tokens, pos, errors, cascade, message):
+        top = stack[-1]
+        token = tokens[pos]
+        expected = self._expected(top)
+        repair = self._repair(stack, tokens, pos, expected)
+        if repair is not None:
+            self._error(errors, cascade, pos, token, expected, message, repair)
+            return self._apply(stack, tokens, pos, repair), False
+
+        start = pos
+        if top in self.tables.terminals:
+            if top == '$':
+                # 句子已经结束但还有输入：丢弃到能开始一个句子的词法单元，重新压入开始符号接着分析，
+                # 后面的错误照样在这一遍里报告
+                start_row = self.tables.parse_table[self.tables.start_symbol]
+                while tokens[pos] not in start_row and tokens[pos] != '$':
+                    pos += 1
+                if tokens[pos] != '$':
+                    stack.append(self.tables.start_symbol)
+            else:
+                stack.pop()
+        else:
+            row = self.tables.parse_table[top]
+            follow = self.follow[top]
+            while tokens[pos] not in row and tokens[pos] not in follow and tokens[pos] != '$':
+                pos += 1
+            if tokens[pos] not in row:
+                stack.pop()
+        self._error(errors, cascade, start, token, expected, message, ('panic', pos - start))
+        return pos, True
+
+    def _trial(self, stack, sequence):
+        parse_table = self.tables.parse_table
+        terminals = self.tables.terminals
+        base = len(stack)
+        extra = []
+        steps = 0
+        for token in sequence:
+            while True:
+                steps += 1
+                if steps > self.trial_steps:
+                    return False
+                if extra:
+                    top = extra.pop()
+                elif base:
+                    base -= 1
+                    top = stack[base]
+                else:
+                    return False
+                if top in terminals:
+                    if top != token:
+                        return False
+                    if token == '$':
+                        return True
+                    break
+                body = parse_table[top].get(token)
+                if body is None:
+                    return False
+                extra.extend(body)
+        return True
+
+    def _consume(self, stack, token):
+        parse_table = self.tables.parse_table
+        while stack[-1] != token:
+            stack.extend(parse_table[stack.pop()][token])
+        stack.pop()
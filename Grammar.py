@@ -1,9 +1,16 @@
 class Grammar:
-    def __init__(self, productions, start_symbol):
-        self.productions = productions  # 产生式列表，如 [('E', ['E', '+', 'T']), ('E', ['T']), ...]
+    def __init__(self, productions, start_symbol, terminals=None):
+        self.productions = list(productions)  # 产生式列表，如 [('E', ['E', '+', 'T']), ('E', ['T']), ...]
         self.start_symbol = start_symbol  # 开始符号
         self.non_terminals = set(p[0] for p in productions)  # 产生式列表中的0索引也就是箭头的左侧 是非终结符，例如A B C 右侧是终结符 a b c
+        # 可选：显式声明的终结符。声明后，右部中既不是终结符也没有产生式的符号算作未定义（见 undefined_symbols），
+        # 而不是像默认那样当作终结符
+        self.declared_terminals = set(terminals) if terminals is not None else None
         self.terminals = self._compute_terminals()
+        # 与 productions 一一对应，记录每条产生式来自原文法的哪些产生式（下标元组），变换后用于还原语法树
+        self.origins = [(i,) for i in range(len(productions))]
+        # 编辑日志：('add' | 'remove', 产生式)，解析器 refresh() 时据此增量更新分析表
+        self.edits = []
 
 
 
@@ -14,7 +21,284 @@ class Grammar:
             for symbol in rhs:
                 if symbol not in self.non_terminals and symbol!= 'ε':
                     terminals.add(symbol)
+        if self.declared_terminals is not None:
+            terminals &= self.declared_terminals
         return terminals
 
+    def undefined_symbols(self):
+        return {s for _, rhs in self.productions for s in rhs
+                if s != 'ε' and s not in self.non_terminals and s not in self.terminals}
+
     def get_productions_for(self,non_terminal):
-        return [p for p in self.productions if p[0]==non_terminal]
\ No newline at end of file
+        return [p for p in self.productions if p[0]==non_terminal]
+
+    def add_production(self, lhs, rhs):
+        production = (lhs, list(rhs))
+        self.productions.append(production)
+        self.origins.append(())  # 新加的产生式不来自原文法
+        self._edited(('add', production))
+        return production
+
+    def remove_production(self, lhs, rhs):
+        production = (lhs, list(rhs))
+        for i, p in enumerate(self.productions):
+            if p[0] == lhs and list(p[1]) == production[1]:
+                del self.productions[i]
+                del self.origins[i]
+                self._edited(('remove', p))
+                return p
+        raise ValueError(f"No production {lhs} -> {' '.join(rhs)}")
+
+    def _edited(self, edit):
+        self.non_terminals = set(p[0] for p in self.productions)
+        self.terminals = self._compute_terminals()
+        self.edits.append(edit)
+
+    def to_ll1(self):
+        # 删除无用符号 -> 消除左递归 -> 提取左公因子 -> 再删除一次无用符号
+        # 结果不保证一定是 LL(1)（例如二义文法），交给 LL1Parser 构造分析表时判断
+        return (self.remove_useless_symbols()
+                .eliminate_left_recursion()
+                .left_factor()
+                .remove_useless_symbols())
+
+    def simplify(self, inline=False):
+        # 建表前的化简：删除无用符号 -> 合并重复产生式 -> （可选）内联只用一次的非终结符 -> 再删除一次无用符号。
+        # 新文法的 origins 记录每条产生式对应的原产生式，语义动作可以据此找回
+        grammar = self.remove_useless_symbols().deduplicate_productions()
+        if inline:
+            grammar = grammar.inline_single_use().remove_useless_symbols()
+        return grammar
+
+    def deduplicate_productions(self):
+        # 完全相同的产生式只保留第一条
+        seen = set()
+        rules = []
+        for lhs, rhs, origin in self._rules():
+            key = (lhs, tuple(rhs))
+            if key not in seen:
+                seen.add(key)
+                rules.append((lhs, rhs, origin))
+        return self._from_rules(rules)
+
+    def inline_single_use(self):
+        # 把只在一处右部出现、且不递归的非终结符 B 代入使用处：A -> α B β, B -> γ 变为 A -> α γ β
+        order, by_lhs = self._group_rules()
+        changed = True
+        while changed:
+            changed = False
+            uses = {}
+            for nt in order:
+                for i, (rhs, _) in enumerate(by_lhs[nt]):
+                    for j, s in enumerate(rhs):
+                        if s in by_lhs:
+                            uses.setdefault(s, []).append((nt, i, j))
+            for b in order:
+                if b == self.start_symbol or len(uses.get(b, ())) != 1:
+                    continue
+                a, i, j = uses[b][0]
+                if a == b or any(b in rhs for rhs, _ in by_lhs[b]):
+                    continue
+                rhs, origin = by_lhs[a][i]
+                inlined = []
+                for sub_rhs, sub_origin in by_lhs[b]:
+                    body = rhs[:j] + [s for s in sub_rhs if s != 'ε'] + rhs[j + 1:]
+                    inlined.append((body or ['ε'], origin + sub_origin))
+                by_lhs[a][i:i + 1] = inlined
+                del by_lhs[b]
+                order.remove(b)
+                changed = True
+                break
+        return self._from_rules([(nt, rhs, o) for nt in order for rhs, o in by_lhs[nt]])
+
+    def remove_useless_symbols(self):
+        rules = self._rules()
+
+        # 先求能推出终结符串的非终结符，再求从开始符号可达的符号
+        productive = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs, _ in rules:
+                if lhs not in productive and all(
+                        s == 'ε' or s in self.terminals or s in productive for s in rhs):
+                    productive.add(lhs)
+                    changed = True
+        rules = [r for r in rules if r[0] in productive and
+                 all(s == 'ε' or s in self.terminals or s in productive for s in r[1])]
+
+        reachable = {self.start_symbol}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs, _ in rules:
+                if lhs in reachable:
+                    for s in rhs:
+                        if s in self.non_terminals and s not in reachable:
+                            reachable.add(s)
+                            changed = True
+        return self._from_rules([r for r in rules if r[0] in reachable])
+
+    def eliminate_left_recursion(self):
+        order, by_lhs = self._group_rules()
+        taken = self.non_terminals | self.terminals
+
+        # 只有 Aj 的左角能到达 Ai 时才把 Aj 代入 Ai，避免把不相关的产生式展开
+        # 注意：经可空前缀的隐式左递归不在处理范围内
+        def left_corners(nt):
+            seen = set()
+            todo = [nt]
+            while todo:
+                for rhs, _ in by_lhs.get(todo.pop(), []):
+                    if rhs[0] in by_lhs and rhs[0] not in seen:
+                        seen.add(rhs[0])
+                        todo.append(rhs[0])
+            return seen
+
+        result_order = []
+        for i, ai in enumerate(order):
+            for aj in order[:i]:
+                if ai not in left_corners(aj):
+                    continue
+                alternatives = []
+                for rhs, origin in by_lhs[ai]:
+                    if rhs[0] != aj:
+                        alternatives.append((rhs, origin))
+                        continue
+                    for sub_rhs, sub_origin in by_lhs[aj]:
+                        body = [s for s in sub_rhs if s != 'ε'] + rhs[1:]
+                        alternatives.append((body or ['ε'], origin + sub_origin))
+                by_lhs[ai] = alternatives
+
+            result_order.append(ai)
+            # A -> A 这样的环直接丢弃，它不改变语言
+            recursive = [(rhs[1:], o) for rhs, o in by_lhs[ai] if rhs[0] == ai and len(rhs) > 1]
+            if not recursive:
+                by_lhs[ai] = [(rhs, o) for rhs, o in by_lhs[ai] if rhs != [ai]]
+                continue
+            tail = self._fresh_name(ai, taken)
+            taken.add(tail)
+            result_order.append(tail)
+            by_lhs[tail] = [(alpha + [tail], o) for alpha, o in recursive] + [(['ε'], ())]
+            by_lhs[ai] = [([s for s in rhs if s != 'ε'] + [tail], o)
+                          for rhs, o in by_lhs[ai] if rhs[0] != ai]
+
+        return self._from_rules([(nt, rhs, o) for nt in result_order for rhs, o in by_lhs[nt]])
+
+    def left_factor(self):
+        order, by_lhs = self._group_rules()
+        taken = self.non_terminals | self.terminals
+
+        i = 0
+        while i < len(order):
+            nt = order[i]
+            groups = {}
+            for rhs, _ in by_lhs[nt]:
+                if rhs != ['ε']:
+                    groups[rhs[0]] = groups.get(rhs[0], 0) + 1
+            shared = next((s for s in groups if groups[s] > 1), None)
+            if shared is None:
+                i += 1
+                continue
+
+            group = [(rhs, o) for rhs, o in by_lhs[nt] if rhs[0] == shared]
+            prefix = list(group[0][0])
+            for rhs, _ in group[1:]:
+                n = 0
+                while n < len(prefix) and n < len(rhs) and prefix[n] == rhs[n]:
+                    n += 1
+                prefix = prefix[:n]
+
+            factored = self._fresh_name(nt, taken)
+            taken.add(factored)
+            order.insert(i + 1, factored)
+            by_lhs[factored] = [(rhs[len(prefix):] or ['ε'], o) for rhs, o in group]
+            alternatives = []
+            for rhs, o in by_lhs[nt]:
+                if rhs[0] != shared:
+                    alternatives.append((rhs, o))
+                elif rhs is group[0][0]:
+                    alternatives.append((prefix + [factored], ()))
+            by_lhs[nt] = alternatives
+            # 同一个非终结符可能还有其它公共前缀，所以不前进 i
+
+        return self._from_rules([(nt, rhs, o) for nt in order for rhs, o in by_lhs[nt]])
+
+    def find_operator_clusters(self):
+        # 识别运算符优先级结构：每一层形如 A -> A op B | B（左结合）或 A -> B op A | B（右结合），
+        # 最底层的初等式 P 的每个候选都以不同的终结符开头，且只引用终结符和本结构内的非终结符，
+        # 各层运算符互不相同。返回 [{'levels': [A0, A1, ...], 'primary': P, 'ops': {op: (层号, 是否右结合)}}]
+        shapes = {nt: self._operator_level(nt) for nt in self.non_terminals}
+        shapes = {nt: shape for nt, shape in shapes.items() if shape is not None}
+        lower = {shape[0] for shape in shapes.values()}
+
+        clusters = []
+        for top in sorted(nt for nt in shapes if nt not in lower):
+            levels, ops = [], {}
+            nt = top
+            while nt in shapes and nt not in levels:
+                below, level_ops, right = shapes[nt]
+                if any(op in ops for op in level_ops):
+                    break
+                for op in level_ops:
+                    ops[op] = (len(levels), right)
+                levels.append(nt)
+                nt = below
+            if nt in shapes or nt in levels:
+                continue
+            members = set(levels) | {nt}
+            primaries = self.get_productions_for(nt)
+            firsts = [rhs[0] for _, rhs in primaries if rhs]
+            if (len(firsts) != len(primaries) or len(set(firsts)) != len(firsts) or
+                    any(s in self.non_terminals for s in firsts) or
+                    any(s in self.non_terminals and s not in members for _, rhs in primaries for s in rhs)):
+                continue
+            clusters.append({'levels': levels, 'primary': nt, 'ops': ops})
+        return clusters
+
+    def _operator_level(self, nt):
+        below, ops, right = None, [], None
+        units = 0
+        for _, rhs in self.get_productions_for(nt):
+            if len(rhs) == 1 and rhs[0] in self.non_terminals and rhs[0] != nt:
+                units += 1
+                unit = rhs[0]
+            elif len(rhs) == 3 and rhs[1] in self.terminals and (rhs[0] == nt) != (rhs[2] == nt):
+                is_right = rhs[2] == nt
+                operand = rhs[0] if is_right else rhs[2]
+                if right not in (None, is_right) or below not in (None, operand) or operand == nt:
+                    return None
+                right, below = is_right, operand
+                ops.append(rhs[1])
+            else:
+                return None
+        if units != 1 or not ops or unit != below or len(set(ops)) != len(ops):
+            return None
+        return below, ops, right
+
+    def _rules(self):
+        return [(lhs, list(rhs) or ['ε'], origin) for (lhs, rhs), origin in zip(self.productions, self.origins)]
+
+    def _from_rules(self, rules):
+        grammar = Grammar([(lhs, rhs) for lhs, rhs, _ in rules], self.start_symbol, self.declared_terminals)
+        grammar.origins = [origin for _, _, origin in rules]
+        return grammar
+
+    def _group_rules(self):
+        # 非终结符按出现顺序排列，开始符号排第一
+        order = [self.start_symbol] if self.start_symbol in self.non_terminals else []
+        by_lhs = {}
+        for lhs, rhs, origin in self._rules():
+            if lhs not in by_lhs:
+                by_lhs[lhs] = []
+                if lhs != self.start_symbol:
+                    order.append(lhs)
+            by_lhs[lhs].append((rhs, origin))
+        return order, by_lhs
+
+    @staticmethod
+    def _fresh_name(base, taken):
+        name = base + "'"
+        while name in taken:
+            name += "'"
+        return name
@@ -0,0 +1,143 @@
+class IncrementalAnalysis:
+    # 在文法增删产生式后原地更新 FIRST/FOLLOW（与解析器共享同一个 dict）。
+    # 只把受影响的非终结符清空后重新求不动点，其余集合保持不变，结果与从头计算一致。
+    def __init__(self, grammar, first, follow=None):
+        self.grammar = grammar
+        self.first = first
+        self.follow = follow
+        self.non_terminals = set(grammar.non_terminals)
+        self.terminals = set(grammar.terminals)
+
+    def apply(self, edits):
+        """应用一批编辑，返回 (FIRST 改变的非终结符, FOLLOW 改变的非终结符, 终结符/非终结符身份互换的符号)"""
+        grammar = self.grammar
+        flipped = (self.non_terminals ^ grammar.non_terminals) | (self.terminals ^ grammar.terminals)
+        self.non_terminals = set(grammar.non_terminals)
+        self.terminals = set(grammar.terminals)
+
+        edited_lhs = {prod[0] for _, prod in edits}
+        edited_symbols = {s for _, prod in edits for s in prod[1]}
+
+        changed_first = self._update_first(edited_lhs, flipped)
+        changed_follow = set()
+        if self.follow is not None:
+            changed_follow = self._update_follow(edited_symbols | flipped, changed_first | flipped)
+        return changed_first, changed_follow, flipped
+
+    def _update_first(self, edited_lhs, flipped):
+        first = self.first
+        users = {}  # B -> 右部含 B 的非终结符
+        for lhs, rhs in self.grammar.productions:
+            for symbol in rhs:
+                users.setdefault(symbol, set()).add(lhs)
+
+        seeds = set(edited_lhs)
+        for symbol in flipped:
+            seeds |= users.get(symbol, set())
+        affected = self._closure(seeds, users)
+
+        old = {nt: first.get(nt) for nt in affected | flipped}
+        for nt in list(first):
+            if nt not in self.grammar.non_terminals:
+                del first[nt]
+        for nt in affected & self.grammar.non_terminals:
+            first[nt] = set()
+
+        changed = True
+        while changed:
+            changed = False
+            for nt in affected & self.grammar.non_terminals:
+                for prod in self.grammar.get_productions_for(nt):
+                    for symbol in prod[1]:
+                        if symbol in self.grammar.terminals:
+                            if symbol not in first[nt]:
+                                first[nt].add(symbol)
+                                changed = True
+                            break
+                        elif symbol in self.grammar.non_terminals:
+                            added = len(first[nt])
+                            first[nt].update(first[symbol] - {'ε'})
+                            if added != len(first[nt]):
+                                changed = True
+                            if 'ε' not in first[symbol]:
+                                break
+                    else:
+                        if 'ε' not in first[nt]:
+                            first[nt].add('ε')
+                            changed = True
+
+        return {nt for nt in old if old[nt] != first.get(nt)}
+
+    def _update_follow(self, edited_symbols, changed_first):
+        follow = self.follow
+        grammar = self.grammar
+
+        # FOLLOW(X) 的来源：X 之后符号的 FIRST，以及 X 位于可空尾部时左部的 FOLLOW
+        seeds = {s for s in edited_symbols if s in grammar.non_terminals}
+        tails = {}  # A -> 在 A 的产生式中处于可空尾部的非终结符
+        for lhs, rhs in grammar.productions:
+            nullable_suffix = True
+            for i in range(len(rhs) - 1, -1, -1):
+                symbol = rhs[i]
+                if symbol in grammar.non_terminals:
+                    if nullable_suffix:
+                        tails.setdefault(lhs, set()).add(symbol)
+                    if any(s in changed_first for s in rhs[i + 1:]):
+                        seeds.add(symbol)
+                    nullable_suffix = nullable_suffix and 'ε' in self.first[symbol]
+                elif symbol != 'ε':
+                    nullable_suffix = False
+        affected = self._closure(seeds, tails) & grammar.non_terminals
+
+        old = {nt: follow.get(nt) for nt in affected | (set(follow) ^ grammar.non_terminals)}
+        for nt in list(follow):
+            if nt not in grammar.non_terminals:
+                del follow[nt]
+        for nt in affected | (grammar.non_terminals - set(follow)):
+            follow[nt] = set()
+            affected.add(nt)
+        if grammar.start_symbol in follow:
+            follow[grammar.start_symbol].add('$')
+
+        changed = True
+        while changed:
+            changed = False
+            for prod in grammar.productions:
+                rhs = prod[1]
+                for i, nt in enumerate(rhs):
+                    if nt not in affected:
+                        continue
+                    next_pos = i + 1
+                    while next_pos < len(rhs):
+                        next_symbol = rhs[next_pos]
+                        if next_symbol in grammar.terminals:
+                            if next_symbol not in follow[nt]:
+                                follow[nt].add(next_symbol)
+                                changed = True
+                            break
+                        elif next_symbol in grammar.non_terminals:
+                            added = len(follow[nt])
+                            follow[nt].update(self.first[next_symbol] - {'ε'})
+                            if added != len(follow[nt]):
+                                changed = True
+                            if 'ε' not in self.first[next_symbol]:
+                                break
+                        next_pos += 1
+                    else:
+                        added = len(follow[nt])
+                        follow[nt].update(follow[prod[0]])
+                        if added != len(follow[nt]):
+                            changed = True
+
+        return {nt for nt in old if old[nt] != follow.get(nt)}
+
+    @staticmethod
+    def _closure(seeds, edges):
+        result = set(seeds)
+        todo = list(seeds)
+        while todo:
+            for nxt in edges.get(todo.pop(), ()):
+                if nxt not in result:
+                    result.add(nxt)
+                    todo.append(nxt)
+        return result
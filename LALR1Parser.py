@@ -1,10 +1,73 @@
 from LR1Item import LR1Item
+from IncrementalAnalysis import IncrementalAnalysis
+from CompiledTables import LRTables
 class LALR1Parser:
+    # refresh() 重新求出的闭包项目数超过原有全部闭包项目数的这个比例时，改为从头重建状态机：
+    # 这时几乎每个状态都要重新求闭包，增量维护状态图和编号的额外开销反而比重建大
+    REBUILD_RATIO = 0.75
+
     def __init__(self, grammar):
         self.grammar = grammar
         self.first = self.compute_first()
-        self.states, self.transitions, self.goto_table = self.build_automaton()
-        self.action_table = self.build_action_table()
+        self.closure_cache = {}  # 核心项目集 -> 闭包，文法编辑后只作废受影响的项
+        # 核心项目集 -> 闭包依赖的 (点后符号, 点后符号之后的符号, 用到的产生式)，用来快速判断编辑后哪些闭包失效
+        self.closure_deps = {}
+        # 保留 LR(1) 状态图（以核心项目集标识状态），编辑后只从闭包被作废的状态重新走，
+        # 再只重新合并、重建受影响的 LALR 状态及其表行
+        start_production = (grammar.start_symbol + "'", [grammar.start_symbol])
+        self.start_kernel = frozenset({LR1Item(start_production, 0, '$')})
+        self.build_automaton()
+        self.analysis = IncrementalAnalysis(grammar, self.first)
+        self.applied_edits = len(grammar.edits)
+
+    def refresh(self):
+        # 应用 grammar.add_production/remove_production 之后的编辑：
+        # 增量更新 FIRST，作废依赖被改动符号的闭包，只从这些状态重新走状态机
+        edits = self.grammar.edits[self.applied_edits:]
+        self.applied_edits = len(self.grammar.edits)
+        if not edits:
+            return 0
+        changed_first, _, flipped = self.analysis.apply(edits)
+
+        expanded = {prod[0] for _, prod in edits} | flipped
+        lookahead_sources = changed_first | flipped
+        removed = {(prod[0], tuple(prod[1])) for kind, prod in edits if kind == 'remove'}
+        stale = [kernel for kernel, (next_symbols, beta_symbols, productions) in self.closure_deps.items()
+                 if next_symbols & expanded or beta_symbols & lookahead_sources or productions & removed]
+        budget = self.REBUILD_RATIO * sum(len(self.closure_cache[kernel]) for kernel in self.lr1_edges)
+        for kernel in stale:
+            del self.closure_cache[kernel]
+            del self.closure_deps[kernel]
+
+        if not self.update_automaton(stale, budget):
+            # 已经求出的闭包都留在缓存里，重建时直接复用
+            self.build_automaton()
+        return len(stale)
+
+    def build_automaton(self):
+        """从头合并 LALR 状态、构造 goto/action 表。仍在缓存中的闭包和由它求出的 LR(1) 出边直接复用，
+        其余状态从起始状态重新走"""
+        edges = getattr(self, 'lr1_edges', {})
+        self.lr1_edges = {kernel: row for kernel, row in edges.items() if kernel in self.closure_cache}
+        self.lr1_preds = {}
+        for kernel, row in self.lr1_edges.items():
+            self.lr1_preds.setdefault(kernel, set())
+            for target in row.values():
+                self.lr1_preds.setdefault(target, set()).add(kernel)
+        self.members = {}  # LR(0) 核心 -> 合并进该 LALR 状态的 LR(1) 核心项目集
+        self.state_ids = {}  # LR(0) 核心 -> LALR 状态编号
+        self.state_cores = []
+        self.states = []
+        self.goto_rows = []  # 每个 LALR 状态的 {符号: 后继状态}，与 goto_table 同步
+        self.action_rows = []  # 每个 LALR 状态的 {终结符: 动作}，与 action_table 同步
+        self.goto_table = {}
+        self.action_table = {}
+        _, order = self._walk_graph((), None)
+        self._prune(set(order))
+        self._merge(order, [])
+        for kernel in [kernel for kernel in self.closure_cache if kernel not in self.lr1_edges]:
+            del self.closure_cache[kernel]
+            del self.closure_deps[kernel]
 
     def compute_first(self):
         first = {nt: set() for nt in self.grammar.non_terminals}
@@ -34,22 +97,25 @@ class LALR1Parser:
         return first
 
     def closure(self, items):
+        # 工作表算法：每个项目只展开一次
+        productions = {}
+        for prod in self.grammar.productions:
+            productions.setdefault(prod[0], []).append(prod)
         closure = set(items)
-        changed = True
-        while changed:
-            changed = False
-            for item in list(closure):
-                next_symbol = item.next_symbol()
-                if next_symbol in self.grammar.non_terminals:
-                    beta = item.production[1][item.dot_pos + 1:]
-                    lookaheads = self.compute_lookaheads(beta, item.lookahead)
-
-                    for prod in self.grammar.get_productions_for(next_symbol):
-                        for lookahead in lookaheads:
-                            new_item = LR1Item(prod, 0, lookahead)
-                            if new_item not in closure:
-                                closure.add(new_item)
-                                changed = True
+        todo = list(closure)
+        while todo:
+            item = todo.pop()
+            next_symbol = item.next_symbol()
+            if next_symbol in self.grammar.non_terminals:
+                beta = item.production[1][item.dot_pos + 1:]
+                lookaheads = self.compute_lookaheads(beta, item.lookahead)
+
+                for prod in productions[next_symbol]:
+                    for lookahead in lookaheads:
+                        new_item = LR1Item(prod, 0, lookahead)
+                        if new_item not in closure:
+                            closure.add(new_item)
+                            todo.append(new_item)
         return frozenset(closure)
 
     def compute_lookaheads(self, beta, lookahead):
@@ -73,94 +139,199 @@ class LALR1Parser:
         for item in items:
             if item.next_symbol() == symbol:
                 new_items.add(item.advance())
-        return self.closure(new_items) if new_items else None
+        return self.cached_closure(new_items) if new_items else None
 
-    def build_automaton(self):
-        # First build LR(1) automaton
-        start_production = (self.grammar.start_symbol + "'", [self.grammar.start_symbol])
-        start_item = LR1Item(start_production, 0, '$')
-        start_state = self.closure({start_item})
+    def cached_closure(self, kernel):
+        kernel = frozenset(kernel)
+        closure = self.closure_cache.get(kernel)
+        if closure is None:
+            closure = self.closure(kernel)
+            self.closure_cache[kernel] = closure
+            next_symbols, beta_symbols, productions = set(), set(), set()
+            for item in closure:
+                rhs = item.production[1]
+                productions.add((item.production[0], tuple(rhs)))
+                if item.dot_pos < len(rhs):
+                    next_symbols.add(rhs[item.dot_pos])
+                    beta_symbols.update(rhs[item.dot_pos + 1:])
+            self.closure_deps[kernel] = (next_symbols, beta_symbols, productions)
+        return closure
 
-        lr1_states = [start_state]
-        transitions = []
-        goto_table = {}
+    def update_automaton(self, kernels, budget=None):
+        """从起始状态沿现有的 LR(1) 状态图走一遍，只重新求 kernels 中和新出现的状态的闭包与出边，
+        删除不再可达的状态，然后只重新合并、重建受影响的 LALR 状态及其 goto/action 行。
+        新求出的闭包项目数超过 budget 时立即返回 False，此时状态图只更新了一部分，需要调用 build_automaton()"""
+        walk = self._walk_graph(kernels, budget)
+        if walk is None:
+            return False
+        walked, order = walk
+        self._merge(walked, self._prune(set(order)))
+        return True
 
-        unprocessed = [start_state]
+    def _walk_graph(self, kernels, budget):
+        # 返回 (重新走过的状态, 按访问顺序排列的全部可达状态)，超出 budget 时返回 None。
+        # 不可达的状态在重新求闭包之前就被跳过：它们可能还含有已删除的产生式，其中的符号已不在文法中
+        stale = set(kernels)
+        walked = []
+        spent = 0
+        order = []
+        reachable = {self.start_kernel}
+        todo = [self.start_kernel]
+        while todo:
+            kernel = todo.pop()
+            order.append(kernel)
+            edges = self.lr1_edges.get(kernel)
+            if edges is None or kernel in stale:
+                edges = self._walk(kernel)
+                walked.append(kernel)
+                spent += len(self.closure_cache[kernel])
+                if budget is not None and spent > budget:
+                    return None
+            for target in reversed(list(edges.values())):
+                if target not in reachable:
+                    reachable.add(target)
+                    todo.append(target)
+        return walked, order
 
-        while unprocessed:
-            current = unprocessed.pop()
+    def _prune(self, reachable):
+        # 删除不再可达的 LR(1) 状态，返回被删除的状态
+        removed = [kernel for kernel in self.lr1_edges if kernel not in reachable]
+        for kernel in removed:
+            self.closure_cache.pop(kernel, None)
+            self.closure_deps.pop(kernel, None)
+            for target in self.lr1_edges.pop(kernel).values():
+                if target in self.lr1_preds:
+                    self.lr1_preds[target].discard(kernel)
+        for kernel in removed:
+            del self.lr1_preds[kernel]
+        return removed
 
-            symbols = set()
-            for item in current:
-                next_sym = item.next_symbol()
-                if next_sym is not None:
-                    symbols.add(next_sym)
-
-            for symbol in symbols:
-                next_state = self.goto(current, symbol)
-
-                if next_state not in lr1_states:
-                    lr1_states.append(next_state)
-                    unprocessed.append(next_state)
-
-                transitions.append((lr1_states.index(current), symbol, lr1_states.index(next_state)))
-
-                goto_key = (lr1_states.index(current), symbol)
-                goto_table[goto_key] = lr1_states.index(next_state)
-
-        # Now merge states with the same core (LR0 items)
-        cores = {}
-        for i, state in enumerate(lr1_states):
-            core = frozenset((item.production, item.dot_pos) for item in state)
-            if core not in cores:
-                cores[core] = []
-            cores[core].append(i)
-
-        # Create mapping from LR1 state to LALR state
-        state_mapping = {}
-        lalr_states = []
-        for core, state_indices in cores.items():
-            # Merge all LR1 states with this core
-            merged_items = set()
-            for idx in state_indices:
-                merged_items.update(lr1_states[idx])
-                state_mapping[idx] = len(lalr_states)
-            lalr_states.append(frozenset(merged_items))
-
-        # Update transitions and goto table
-        new_transitions = []
-        new_goto_table = {}
-        for src, symbol, dest in transitions:
-            new_src = state_mapping[src]
-            new_dest = state_mapping[dest]
-            new_transitions.append((new_src, symbol, new_dest))
-            new_goto_table[(new_src, symbol)] = new_dest
-
-        return lalr_states, new_transitions, new_goto_table
-
-    def build_action_table(self):
-        action_table = {}
-
-        for state_idx, state in enumerate(self.states):
-            for item in state:
-                if item.is_reduce_item():
-                    if item.production[0] == self.grammar.start_symbol + "'":
-                        action_table[(state_idx, '$')] = ('accept',)
-                    else:
-                        action_key = (state_idx, item.lookahead)
-                        if action_key in action_table:
-                            existing_action = action_table[action_key]
-                            if existing_action[0] != 'reduce' or existing_action[1] != item.production:
-                                raise ValueError("Grammar is not LALR(1)")
-                        action_table[action_key] = ('reduce', item.production)
+    def _merge(self, walked, removed):
+        # 只重新合并受影响的 LALR 状态：含有重新走过、新增或删除的 LR(1) 状态的核心
+        affected = {}  # 按首次出现的顺序编号
+        for kernel in walked:
+            core = self._core(kernel)
+            self.members.setdefault(core, set()).add(kernel)
+            affected.setdefault(core)
+        dropped = []
+        for kernel in removed:
+            core = self._core(kernel)
+            if core not in self.members:
+                continue
+            self.members[core].discard(kernel)
+            if not self.members[core]:
+                del self.members[core]
+                if core in self.state_ids:
+                    dropped.append(self.state_ids.pop(core))
+            else:
+                affected.setdefault(core)
+        affected = [core for core in affected if core in self.members]
+
+        for core in affected:
+            if core not in self.state_ids:
+                self.state_ids[core] = len(self.states)
+                self.state_cores.append(core)
+                self.states.append(None)
+                self.goto_rows.append({})
+                self.action_rows.append({})
+        for state_id in sorted(dropped, reverse=True):
+            self._drop_state(state_id)
+
+        for core in affected:
+            state_id = self.state_ids[core]
+            closures = [self.cached_closure(kernel) for kernel in self.members[core]]
+            self.states[state_id] = frozenset().union(*closures)
+        for core in affected:
+            state_id = self.state_ids[core]
+            member = next(iter(self.members[core]))
+            self._set_row(self.goto_table, self.goto_rows, state_id, {
+                symbol: self.state_ids[self._core(target)] for symbol, target in self.lr1_edges[member].items()})
+        for core in affected:
+            state_id = self.state_ids[core]
+            self._set_row(self.action_table, self.action_rows, state_id, self.build_action_row(state_id))
+        self.transitions = [(src, symbol, dest) for (src, symbol), dest in self.goto_table.items()]
+
+    def _walk(self, kernel):
+        # 按闭包重新求一个 LR(1) 状态的出边，并同步前驱表
+        by_symbol = {}
+        for item in self.cached_closure(kernel):
+            next_sym = item.next_symbol()
+            if next_sym is not None:
+                by_symbol.setdefault(next_sym, set()).add(item.advance())
+        # 按符号排序遍历，状态编号不受集合迭代顺序影响
+        edges = {symbol: frozenset(by_symbol[symbol]) for symbol in sorted(by_symbol)}
+        for target in self.lr1_edges.get(kernel, {}).values():
+            self.lr1_preds[target].discard(kernel)
+        self.lr1_edges[kernel] = edges
+        self.lr1_preds.setdefault(kernel, set())
+        for target in edges.values():
+            self.lr1_preds.setdefault(target, set()).add(kernel)
+        return edges
+
+    def _drop_state(self, state_id):
+        # 删除一个 LALR 状态：把编号最大的状态挪到它的位置，并改写指向被挪状态的 goto 和移进动作
+        self._set_row(self.goto_table, self.goto_rows, state_id, {})
+        self._set_row(self.action_table, self.action_rows, state_id, {})
+        last = len(self.states) - 1
+        if state_id != last:
+            core = self.state_cores[last]
+            goto_row, action_row = self.goto_rows[last], self.action_rows[last]
+            self._set_row(self.goto_table, self.goto_rows, last, {})
+            self._set_row(self.action_table, self.action_rows, last, {})
+            self.states[state_id] = self.states[last]
+            self.state_cores[state_id] = core
+            self.state_ids[core] = state_id
+            self._set_row(self.goto_table, self.goto_rows, state_id, goto_row)
+            self._set_row(self.action_table, self.action_rows, state_id, action_row)
+            sources = {self.state_ids[self._core(pred)]
+                       for kernel in self.members[core] for pred in self.lr1_preds.get(kernel, ())}
+            for source in sources:
+                for symbol, target in list(self.goto_rows[source].items()):
+                    if target == last:
+                        self.goto_rows[source][symbol] = state_id
+                        self.goto_table[(source, symbol)] = state_id
+                        if self.action_rows[source].get(symbol) == ('shift', last):
+                            self.action_rows[source][symbol] = ('shift', state_id)
+                            self.action_table[(source, symbol)] = ('shift', state_id)
+        self.states.pop()
+        self.state_cores.pop()
+        self.goto_rows.pop()
+        self.action_rows.pop()
+
+    @staticmethod
+    def _set_row(table, rows, state_id, row):
+        for symbol in rows[state_id]:
+            del table[(state_id, symbol)]
+        rows[state_id] = row
+        for symbol, value in row.items():
+            table[(state_id, symbol)] = value
+
+    @staticmethod
+    def _core(kernel):
+        # 核心项目集的 LR(0) 部分决定了闭包的 LR(0) 部分，按它合并即按闭包的核心合并
+        return frozenset((item.production[0], tuple(item.production[1]), item.dot_pos) for item in kernel)
+
+    def build_action_row(self, state_idx):
+        row = {}
+        goto_row = self.goto_rows[state_idx]
+        for item in self.states[state_idx]:
+            if item.is_reduce_item():
+                if item.production[0] == self.grammar.start_symbol + "'":
+                    row['$'] = ('accept',)
                 else:
-                    next_sym = item.next_symbol()
-                    if next_sym in self.grammar.terminals:
-                        goto_key = (state_idx, next_sym)
-                        if goto_key in self.goto_table:
-                            action_table[goto_key] = ('shift', self.goto_table[goto_key])
+                    if item.lookahead in row:
+                        existing_action = row[item.lookahead]
+                        if existing_action[0] != 'reduce' or existing_action[1] != item.production:
+                            raise ValueError("Grammar is not LALR(1)")
+                    row[item.lookahead] = ('reduce', item.production)
+            else:
+                next_sym = item.next_symbol()
+                if next_sym in self.grammar.terminals and next_sym in goto_row:
+                    row[next_sym] = ('shift', goto_row[next_sym])
+        return row
 
-        return action_table
+    def compile(self):
+        return LRTables.from_parser(self)
 
     def parse(self, input_tokens):
         input_tokens = input_tokens + ['$']
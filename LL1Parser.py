@@ -1,3 +1,6 @@
+from IncrementalAnalysis import IncrementalAnalysis
+from CompiledTables import LLTables
+
 
 class LL1Parser:
     def __init__(self, grammar):
@@ -5,6 +8,29 @@ class LL1Parser:
         self.first = self.compute_first()
         self.follow = self.compute_follow()
         self.parse_table = self.build_parse_table()
+        self.analysis = IncrementalAnalysis(grammar, self.first, self.follow)
+        self.applied_edits = len(grammar.edits)
+
+    def refresh(self):
+        # 应用 grammar.add_production/remove_production 之后的编辑，只重建受影响的行
+        edits = self.grammar.edits[self.applied_edits:]
+        self.applied_edits = len(self.grammar.edits)
+        if not edits:
+            return set()
+        changed_first, changed_follow, flipped = self.analysis.apply(edits)
+
+        changed_symbols = changed_first | flipped
+        rows = {prod[0] for _, prod in edits} | changed_follow
+        for lhs, rhs in self.grammar.productions:
+            if lhs not in rows and any(s in changed_symbols for s in rhs):
+                rows.add(lhs)
+        for nt in list(self.parse_table):
+            if nt not in self.grammar.non_terminals:
+                del self.parse_table[nt]
+        rows &= self.grammar.non_terminals
+        for nt in rows:
+            self.parse_table[nt] = self.build_table_row(nt)
+        return rows
 
     def compute_first(self):
         first = {nt: set() for nt in self.grammar.non_terminals}
@@ -71,23 +97,29 @@ class LL1Parser:
     def build_parse_table(self):
         table = {}
         for nt in self.grammar.non_terminals:
-            table[nt] = {}
-            for prod in self.grammar.get_productions_for(nt):
-                first_alpha = self.compute_string_first(prod[1])
-                for terminal in first_alpha - {'ε'}:
-                    if terminal in table[nt]:
-                        raise ValueError("Grammar is not LL(1)")
-                    table[nt][terminal] = prod
-                if 'ε' in first_alpha:
-                    for terminal in self.follow[nt]:
-                        if terminal in table[nt]:
-                            raise ValueError("Grammar is not LL(1)")
-                        table[nt][terminal] = prod
+            table[nt] = self.build_table_row(nt)
         return table
 
+    def build_table_row(self, nt):
+        row = {}
+        for prod in self.grammar.get_productions_for(nt):
+            first_alpha = self.compute_string_first(prod[1])
+            for terminal in first_alpha - {'ε'}:
+                if terminal in row:
+                    raise ValueError("Grammar is not LL(1)")
+                row[terminal] = prod
+            if 'ε' in first_alpha:
+                for terminal in self.follow[nt]:
+                    if terminal in row:
+                        raise ValueError("Grammar is not LL(1)")
+                    row[terminal] = prod
+        return row
+
     def compute_string_first(self, symbols):
         result = set()
         for symbol in symbols:
+            if symbol == 'ε':
+                continue
             if symbol in self.grammar.terminals:
                 result.add(symbol)
                 return result
@@ -98,6 +130,9 @@ class LL1Parser:
         result.add('ε')
         return result
 
+    def compile(self):
+        return LLTables.from_parser(self)
+
     def parse(self, input_tokens):
         input_tokens = input_tokens + ['$']
         stack = ['$', self.grammar.start_symbol]
@@ -1,3 +1,6 @@
+from CompiledTables import LRTables
+
+
 class LR0Item:
     def __init__(self, production, dot_pos=0):
         self.production = production
@@ -7,7 +10,8 @@ class LR0Item:
         return self.production == other.production and self.dot_pos == other.dot_pos
 
     def __hash__(self):
-        return hash((self.production, self.dot_pos))
+        # 产生式右部是 list，取哈希前转成 tuple
+        return hash((self.production[0], tuple(self.production[1]), self.dot_pos))
 
     def next_symbol(self):
         if self.dot_pos < len(self.production[1]):
@@ -103,6 +107,9 @@ class LR0Parser:
 
         return action_table
 
+    def compile(self):
+        return LRTables.from_parser(self)
+
     def parse(self, input_tokens):
         input_tokens = input_tokens + ['$']
         stack = [0]
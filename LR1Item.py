@@ -1,3 +1,7 @@
+import time
+from CompiledTables import LRTables
+
+
 class LR1Item:
     def __init__(self, production, dot_pos=0, lookahead=None):
         self.production = production
@@ -10,7 +14,7 @@ class LR1Item:
                 self.lookahead == other.lookahead)
 
     def __hash__(self):
-        return hash((self.production, self.dot_pos, self.lookahead))
+        return hash((self.production[0], tuple(self.production[1]), self.dot_pos, self.lookahead))
 
     def next_symbol(self):
         if self.dot_pos < len(self.production[1]):
@@ -25,8 +29,27 @@ class LR1Item:
 
 
 class LR1Parser:
-    def __init__(self, grammar):
+    # 规范 LR(1) 的状态数可能随文法规模急剧增长。构造时可以给出预算（状态数、项目数或估算的内存字节数），
+    # 超出预算后按 fallback 处理：'abort' 抛出 ValueError；'merge' 改用 Pager 的弱相容合并（同核心的状态只要
+    # 合并后不会产生新的归约-归约冲突就合并，分析能力与 LR(1) 相同）；'lalr' 同核心一律合并，得到 LALR(1)。
+    # 两种合并都直接按核心构造，不会先建出完整的规范 LR(1) 状态机
+    ITEM_BYTES = 200  # 每个项目约占的内存（tracemalloc 实测峰值约 180 字节），用于把 max_memory 换算成项目数
+    PROGRESS_INTERVAL = 1000  # 每新建这么多状态调用一次 progress
+
+    def __init__(self, grammar, max_states=None, max_items=None, max_memory=None, fallback='merge', progress=None):
+        if fallback not in ('abort', 'merge', 'lalr'):
+            raise ValueError(f"Unknown fallback {fallback!r}")
         self.grammar = grammar
+        self.max_states = max_states
+        self.max_items = max_items
+        if max_memory is not None:
+            memory_items = max_memory // self.ITEM_BYTES
+            self.max_items = memory_items if max_items is None else min(max_items, memory_items)
+        self.fallback = fallback
+        self.progress = progress
+        # 构造统计：strategy、states、items、elapsed；回退时还有 exceeded（超出预算时的统计）
+        # 和 split_conflicts（强制保留不合并的同核心状态的冲突，见 build_merged_automaton）
+        self.build_stats = {}
         self.first = self.compute_first()
         self.states, self.transitions, self.goto_table = self.build_automaton()
         self.action_table = self.build_action_table()
@@ -101,18 +124,39 @@ class LR1Parser:
         return self.closure(new_items) if new_items else None
 
     def build_automaton(self):
+        start_time = time.time()
+        result = self.build_canonical_automaton(start_time)
+        if result is not None:
+            return result
+
+        exceeded = dict(self.build_stats)
+        if self.fallback == 'abort':
+            raise ValueError(f"LR(1) automaton exceeded the budget after {exceeded['states']} states, "
+                             f"{exceeded['items']} items and {exceeded['elapsed']:.2f}s")
+        result = self.build_merged_automaton(start_time, split=self.fallback == 'merge')
+        self.build_stats['exceeded'] = exceeded
+        if result is None:
+            raise ValueError(f"{self.build_stats['strategy']} automaton also exceeded the budget after "
+                             f"{self.build_stats['states']} states and {self.build_stats['items']} items")
+        return result
+
+    def build_canonical_automaton(self, start_time):
+        """规范 LR(1) 构造，超出预算时返回 None"""
         start_production = (self.grammar.start_symbol + "'", [self.grammar.start_symbol])
         start_item = LR1Item(start_production, 0, '$')
         start_state = self.closure({start_item})
 
         states = [start_state]
+        state_index = {start_state: 0}
         transitions = []
         goto_table = {}
+        items = len(start_state)
 
         unprocessed = [start_state]
 
         while unprocessed:
             current = unprocessed.pop()
+            current_idx = state_index[current]
 
             symbols = set()
             for item in current:
@@ -120,20 +164,157 @@ class LR1Parser:
                 if next_sym is not None:
                     symbols.add(next_sym)
 
-            for symbol in symbols:
+            for symbol in sorted(symbols):
                 next_state = self.goto(current, symbol)
 
-                if next_state not in states:
+                if next_state not in state_index:
+                    state_index[next_state] = len(states)
                     states.append(next_state)
                     unprocessed.append(next_state)
+                    items += len(next_state)
+                    if not self._report('LR(1)', len(states), items, start_time):
+                        return None
 
-                transitions.append((states.index(current), symbol, states.index(next_state)))
+                transitions.append((current_idx, symbol, state_index[next_state]))
 
-                goto_key = (states.index(current), symbol)
-                goto_table[goto_key] = states.index(next_state)
+                goto_key = (current_idx, symbol)
+                goto_table[goto_key] = state_index[next_state]
 
+        self._report('LR(1)', len(states), items, start_time, done=True)
         return states, transitions, goto_table
 
+    def build_merged_automaton(self, start_time, split=True):
+        """按核心合并的构造，超出预算时返回 None。
+
+        split=True 时只合并弱相容（Pager）的同核心状态：对任意两个不同的核心项目 i、j，
+        若合并后 i 和 j 的向前看符号相交，则这个交集在合并前就已出现在某一个状态里。
+        不相容、因而保留为不同状态的冲突记入 build_stats['split_conflicts']。
+        split=False 时同核心一律合并，得到 LALR(1)，这些冲突同样记录下来，它们就是 LALR(1) 新增的归约-归约冲突。
+        """
+        strategy = 'Pager LR(1)' if split else 'LALR(1)'
+        start_production = (self.grammar.start_symbol + "'", [self.grammar.start_symbol])
+        kernels = [frozenset({LR1Item(start_production, 0, '$')})]
+        by_core = {self._core(kernels[0]): [0]}
+        sizes = [0]  # 每个状态闭包的项目数
+        items = 0
+        goto_table = {}
+        split_conflicts = {}
+        unprocessed = [0]
+
+        def lookup(kernel):
+            core = self._core(kernel)
+            for idx in by_core.get(core, ()):
+                existing = kernels[idx]
+                if kernel <= existing:
+                    return idx
+                conflict = self._merge_conflict(existing, kernel)
+                if conflict is not None:
+                    split_conflicts.setdefault(conflict[:2], set()).update(conflict[2])
+                if conflict is None or not split:
+                    # 向前看符号增加了，重新处理这个状态，把新的向前看符号传给后继
+                    kernels[idx] = existing | kernel
+                    unprocessed.append(idx)
+                    return idx
+            idx = len(kernels)
+            kernels.append(kernel)
+            sizes.append(0)
+            by_core.setdefault(core, []).append(idx)
+            unprocessed.append(idx)
+            return idx
+
+        while unprocessed:
+            idx = unprocessed.pop()
+            current = self.closure(kernels[idx])
+            items += len(current) - sizes[idx]
+            sizes[idx] = len(current)
+
+            symbols = set()
+            for item in current:
+                next_sym = item.next_symbol()
+                if next_sym is not None:
+                    symbols.add(next_sym)
+
+            for symbol in sorted(symbols):
+                kernel = frozenset(item.advance() for item in current if item.next_symbol() == symbol)
+                count = len(kernels)
+                goto_table[(idx, symbol)] = lookup(kernel)
+                if len(kernels) > count and not self._report(strategy, len(kernels), items, start_time):
+                    return None
+
+        # 重新处理合并过的状态时，后继可能换成了别的同核心状态，去掉不再可达的状态并重新编号
+        successors = {}
+        for (src, symbol), dest in sorted(goto_table.items()):
+            successors.setdefault(src, []).append(dest)
+        numbering = {0: 0}
+        order = [0]
+        for idx in order:
+            for target in successors.get(idx, ()):
+                if target not in numbering:
+                    numbering[target] = len(order)
+                    order.append(target)
+        states = [self.closure(kernels[idx]) for idx in order]
+        transitions = []
+        new_goto_table = {}
+        for (src, symbol), dest in goto_table.items():
+            if src in numbering:
+                transitions.append((numbering[src], symbol, numbering[dest]))
+                new_goto_table[(numbering[src], symbol)] = numbering[dest]
+
+        self._report(strategy, len(states), sum(len(state) for state in states), start_time, done=True)
+        self.build_stats['split_conflicts'] = [
+            {'items': items, 'lookaheads': sorted(lookaheads)}
+            for items, lookaheads in sorted(split_conflicts.items())
+        ]
+        return states, transitions, new_goto_table
+
+    def _report(self, strategy, states, items, start_time, done=False):
+        # 更新构造统计并按间隔回调 progress，返回是否仍在预算之内
+        self.build_stats = {'strategy': strategy, 'states': states, 'items': items,
+                            'elapsed': time.time() - start_time}
+        if self.progress is not None and (done or states % self.PROGRESS_INTERVAL == 0):
+            self.progress(dict(self.build_stats, done=done))
+        return ((self.max_states is None or states <= self.max_states) and
+                (self.max_items is None or items <= self.max_items))
+
+    def _conflict_message(self):
+        message = f"Grammar is not {self.build_stats.get('strategy', 'LR(1)')}"
+        if self.build_stats.get('strategy') == 'LALR(1)' and self.build_stats['split_conflicts']:
+            # 回退到 LALR(1) 后才出现的冲突，说明是合并同核心状态造成的
+            message += " (merged states conflict: " + "; ".join(
+                f"{c['items'][0]} / {c['items'][1]} on {', '.join(c['lookaheads'])}"
+                for c in self.build_stats['split_conflicts']) + ")"
+        return message
+
+    @staticmethod
+    def _core(kernel):
+        return frozenset((item.production[0], tuple(item.production[1]), item.dot_pos) for item in kernel)
+
+    @classmethod
+    def _merge_conflict(cls, a, b):
+        # Pager 的弱相容判定，相容时返回 None，否则返回 (项目 i, 项目 j, 合并后新出现的共同向前看符号)
+        lookaheads_a = cls._lookaheads(a)
+        lookaheads_b = cls._lookaheads(b)
+        core = sorted(lookaheads_a)
+        for n, i in enumerate(core):
+            for j in core[n + 1:]:
+                new = ((lookaheads_a[i] & lookaheads_b[j]) | (lookaheads_b[i] & lookaheads_a[j]))
+                if new and not (lookaheads_a[i] & lookaheads_a[j]) and not (lookaheads_b[i] & lookaheads_b[j]):
+                    return cls._describe(i), cls._describe(j), new
+        return None
+
+    @staticmethod
+    def _lookaheads(kernel):
+        lookaheads = {}
+        for item in kernel:
+            key = (item.production[0], tuple(item.production[1]), item.dot_pos)
+            lookaheads.setdefault(key, set()).add(item.lookahead)
+        return lookaheads
+
+    @staticmethod
+    def _describe(core_item):
+        lhs, rhs, dot = core_item
+        return f"{lhs} -> {' '.join(rhs[:dot] + ('.',) + rhs[dot:])}"
+
     def build_action_table(self):
         action_table = {}
 
@@ -145,7 +326,7 @@ class LR1Parser:
                     else:
                         action_key = (state_idx, item.lookahead)
                         if action_key in action_table:
-                            raise ValueError("Grammar is not LR(1)")
+                            raise ValueError(self._conflict_message())
                         action_table[action_key] = ('reduce', item.production)
                 else:
                     next_sym = item.next_symbol()
@@ -156,6 +337,9 @@ class LR1Parser:
 
         return action_table
 
+    def compile(self):
+        return LRTables.from_parser(self)
+
     def parse(self, input_tokens):
         input_tokens = input_tokens + ['$']
         stack = [0]
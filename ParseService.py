@@ -0,0 +1,261 @@
+import asyncio
+import codecs
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def tokenize(text, terminals, final=True, offset=0):
+    """按终结符做最长匹配的简单词法分析。final=False 时末尾可能是被数据块截断的终结符，原样留作剩余文本；
+    offset 是 text 在整行中的起始位置，报错时用来给出行内偏移"""
+    literals = sorted(terminals, key=len, reverse=True)
+    tokens = []
+    starts = []
+    pos = 0
+    while pos < len(text):
+        if text[pos].isspace():
+            pos += 1
+            continue
+        for literal in literals:
+            if text.startswith(literal, pos):
+                tokens.append(literal)
+                starts.append(pos)
+                pos += len(literal)
+                break
+        else:
+            if not final and _is_proper_prefix(text[pos:], literals):
+                return tokens, text[pos:]
+            raise SyntaxError(f"Unknown character {text[pos]!r} at offset {offset + pos}")
+    if not final:
+        # 例如 "i" 可能是 "id" 的前半截：从末尾往前找最早一个能接成更长终结符的位置，留到下一个数据块
+        longest = len(literals[0]) if literals else 0
+        cut = len(tokens)
+        for i in range(len(tokens) - 1, -1, -1):
+            if len(text) - starts[i] >= longest:
+                break
+            if _is_proper_prefix(text[starts[i]:], literals):
+                cut = i
+        if cut < len(tokens):
+            return tokens[:cut], text[starts[cut]:]
+    return tokens, ''
+
+
+def _is_proper_prefix(text, literals):
+    return any(len(literal) > len(text) and literal.startswith(text) for literal in literals)
+
+
+_worker_tables = None
+
+
+def _init_worker(parser_class, grammar):
+    global _worker_tables
+    _worker_tables = parser_class(grammar).compile()
+
+
+def _parse_in_worker(stack, tokens, final):
+    # 从主进程已分析到的栈继续，返回 (分析后的栈, None) 或 (None, (出错位置相对 tokens 的偏移, 信息))
+    session = _worker_tables.session()
+    session.stack = list(stack)
+    for i, token in enumerate(tokens):
+        try:
+            session.feed(token)
+        except SyntaxError as e:
+            return None, (i, str(e))
+    if final:
+        try:
+            session.finish()
+        except SyntaxError as e:
+            return None, (len(tokens), str(e))
+    return session.stack, None
+
+
+class ParseService:
+    # 基于 asyncio 的分析服务。协议按行：每行是一个输入（空白分隔的词法单元，或 raw_text 模式下的原始文本），
+    # 服务对每行回复一行 "OK" 或 "ERROR <位置> <信息>"。数据边到达边分析，不等整行读完。
+    def __init__(self, parser, raw_text=False, slice_tokens=256, read_size=16384,
+                 max_active=64, process_workers=0, offload_threshold=100000, offload_batch=65536):
+        self.tables = parser.compile()
+        self.terminals = set(parser.grammar.terminals)
+        self.longest_terminal = max(map(len, self.terminals), default=0)
+        self.raw_text = raw_text
+        self.slice_tokens = slice_tokens  # 每分析这么多词法单元让出一次事件循环，长输入在连接间公平交替
+        self.read_size = read_size
+        self.active = asyncio.Semaphore(max_active)  # 同时分析的连接数上限，超出的连接不再读数据，由 TCP 反压
+        self.offload_threshold = offload_threshold
+        self.offload_batch = offload_batch  # 交给进程池的长输入按批发送，内存里最多攒一批
+        self.pool = None
+        if process_workers:
+            # 不用 fork：事件循环和执行器的线程已经在跑，fork 出的子进程可能继承被占用的锁
+            self.pool = ProcessPoolExecutor(process_workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker, initargs=(type(parser), parser.grammar))
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        # 带缓冲上限的 StreamReader：服务端读得慢时客户端的写会被阻塞
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path, limit=self.read_size)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port, limit=self.read_size)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    async def handle(self, reader, writer):
+        try:
+            async with self.active:
+                await self._serve_connection(reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_connection(self, reader, writer):
+        session = self.tables.session()
+        decoder = codecs.getincrementaldecoder('utf-8')()  # 多字节字符可能被数据块截断
+        pending = ''
+        line = _LineState(session)
+
+        while True:
+            chunk = await reader.read(self.read_size)
+            if not chunk:
+                break
+            pending += decoder.decode(chunk)
+            *complete, pending = pending.split('\n')
+
+            for text in complete:
+                await self._feed(line, text, final=True)
+                writer.write((await self._finish(line) + '\n').encode())
+                # 客户端不读回复时在这里等待，避免回复在内存里无限堆积
+                await writer.drain()
+            if pending:
+                pending = await self._feed(line, pending, final=False)
+
+        if pending or line.count or line.error is not None:
+            await self._feed(line, pending, final=True)
+            writer.write((await self._finish(line) + '\n').encode())
+            await writer.drain()
+
+    async def _feed(self, line, text, final):
+        if line.error is not None:
+            return ''
+        if self.raw_text:
+            try:
+                tokens, rest = tokenize(text, self.terminals, final, offset=line.chars)
+            except SyntaxError as e:
+                line.error = f"{line.count} {e}"
+                return ''
+            line.chars += len(text) - len(rest)
+        else:
+            tokens = text.split()
+            rest = ''
+            if not final and tokens and not text[-1].isspace():
+                tokens, rest = tokens[:-1], tokens[-1]
+                if len(rest) > self.longest_terminal:
+                    # 已经比所有终结符都长，不可能再接成合法的词法单元，不必继续攒着
+                    tokens, rest = tokens + [rest], ''
+
+        for start in range(0, len(tokens), self.slice_tokens):
+            batch = tokens[start:start + self.slice_tokens]
+            if line.buffer is not None:
+                line.buffer.extend(batch)
+                if len(line.buffer) >= self.offload_batch:
+                    await self._offload(line, final=False)
+                    if line.error is not None:
+                        return ''
+            else:
+                for token in batch:
+                    try:
+                        line.session.feed(token)
+                    except SyntaxError as e:
+                        line.error = f"{line.count} {e}"
+                        return ''
+                    line.count += 1
+                if self.pool is not None and line.count >= self.offload_threshold:
+                    line.buffer = []
+            await asyncio.sleep(0)
+        return rest
+
+    async def _offload(self, line, final):
+        # 长输入：带着当前的栈把攒下的一批交给进程池，分析完取回新的栈，事件循环不被这一行占住
+        tokens, line.buffer = line.buffer, []
+        stack, error = await asyncio.get_running_loop().run_in_executor(
+            self.pool, _parse_in_worker, line.session.stack, tokens, final)
+        if error is not None:
+            line.error = f"{line.count + error[0]} {error[1]}"
+        else:
+            line.session.stack = stack
+            line.count += len(tokens)
+
+    async def _finish(self, line):
+        try:
+            if line.error is None and line.buffer is not None:
+                await self._offload(line, final=True)
+                if line.error is None:
+                    return "OK"
+            if line.error is not None:
+                return f"ERROR {line.error}"
+            try:
+                line.session.finish()
+            except SyntaxError as e:
+                return f"ERROR {line.count} {e}"
+            return "OK"
+        finally:
+            line.reset()
+
+
+class _LineState:
+    __slots__ = ('session', 'count', 'chars', 'error', 'buffer')
+
+    def __init__(self, session):
+        self.session = session
+        self.reset()
+
+    def reset(self):
+        self.session.reset()
+        self.count = 0
+        self.chars = 0  # raw_text 模式下本行已切分的字符数
+        self.error = None
+        self.buffer = None
+
+
+async def run_load(requests, concurrency=8, host='127.0.0.1', port=None, path=None):
+    """本地压测：concurrency 个连接并发发送 requests（每个元素是一行文本），返回吞吐量和延迟统计"""
+    queue = list(reversed(requests))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        while queue:
+            text = queue.pop()
+            start = time.perf_counter()
+            writer.write((text + '\n').encode())
+            await writer.drain()
+            reply = await reader.readline()
+            latencies.append(time.perf_counter() - start)
+            if not reply.startswith(b'OK'):
+                errors += 1
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_latency": latencies[len(latencies) // 2] if latencies else 0.0,
+        "p99_latency": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    }
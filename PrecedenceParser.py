@@ -0,0 +1,185 @@
+from LALR1Parser import LALR1Parser
+
+_EXPR, _PRIMARY = 'expr', 'primary'  # 优先级爬升引擎的两种帧
+
+
+class PrecedenceParser:
+    # 在 LALR(1) 驱动中嵌入优先级爬升：LR 状态即将分析一个运算符优先级结构时，交给爬升引擎分析出完整的表达式，
+    # 再按 goto 回到 LR。引擎产生的归约序列与纯 LR 完全相同，但一串单位归约（如 F -> T -> E）
+    # 按预先算好的元组一次性输出，不再对每一层查一次 action/goto 表。
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.lr = LALR1Parser(grammar)
+        self.clusters = [self._compile_cluster(c) for c in grammar.find_operator_clusters()]
+        self.handoff = self._build_handoff()
+
+    def _compile_cluster(self, cluster):
+        levels = cluster['levels']
+        members = levels + [cluster['primary']]
+        index = {nt: i for i, nt in enumerate(members)}
+
+        ops = {}
+        units = []
+        for i, nt in enumerate(levels):
+            for prod in self.grammar.get_productions_for(nt):
+                rhs = prod[1]
+                if len(rhs) == 1:
+                    units.append(prod)
+                else:
+                    level, right = cluster['ops'][rhs[1]]
+                    ops[rhs[1]] = (level, right, prod)
+
+        # chains[i][j]：把第 i 层的结果单位归约到第 j 层（j <= i）依次用到的产生式
+        chains = [[tuple(reversed(units[j:i])) for j in range(i + 1)] for i in range(len(members))]
+
+        primaries = {}
+        for prod in self.grammar.get_productions_for(cluster['primary']):
+            body = tuple((s, index[s]) if s in index else (s, None) for s in prod[1])
+            primaries[prod[1][0]] = (body, prod)
+
+        return {'members': members, 'ops': ops, 'chains': chains, 'primaries': primaries,
+                'primary_level': len(levels)}
+
+    def _build_handoff(self):
+        # (LR 状态, 向前看符号) -> (结构, 起始层, 非终结符, 停止符号)。只有状态中结构外的上下文（核心项目，或左部不在结构中的项目）
+        # 都期待结构中的同一个非终结符，且没有结构外的项目会移进同一个符号时才交给引擎：
+        # 这时引擎停在这一层与 LR 的选择一致；期待不同层时由 LR 按向前看符号决定停在哪一层。
+        # 停止符号是 goto 后的状态里结构外的项目也会移进的运算符（如 S -> E0 . + x），
+        # 引擎在最外层遇到它们就结束，交给 LR 按后面的词法单元决定
+        handoff = {}
+        for cluster in self.clusters:
+            members = cluster['members']
+            index = {nt: i for i, nt in enumerate(members)}
+            primary = members[-1]
+            for state_idx, state in enumerate(self.lr.states):
+                expected = {item.next_symbol() for item in state
+                            if item.next_symbol() in index and (item.dot_pos or item.production[0] not in index)}
+                if len(expected) != 1:
+                    continue
+                nt = expected.pop()
+                target = self.lr.states[self.lr.goto_table[(state_idx, nt)]]
+                stops = frozenset(item.next_symbol() for item in target
+                                  if item.next_symbol() in cluster['ops'] and item.production[0] not in index)
+                for token in cluster['primaries']:
+                    if any(item.next_symbol() == token and item.production[0] != primary for item in state):
+                        continue
+                    handoff[(state_idx, token)] = (cluster, index[nt], nt, stops)
+        return handoff
+
+    def parse(self, input_tokens, use_precedence=True):
+        """返回归约序列（最右推导的逆序），与 LALR1Parser 的归约顺序相同"""
+        return self.parse_with_steps(input_tokens, use_precedence)[0]
+
+    def parse_with_steps(self, input_tokens, use_precedence=True):
+        """返回 (归约序列, 驱动步数)，LR 循环一次或引擎循环一次记一步。不修改解析器本身，可在多线程间共享"""
+        tokens = input_tokens + ['$']
+        action_table = self.lr.action_table
+        goto_table = self.lr.goto_table
+        handoff = self.handoff if use_precedence else {}
+        reductions = []
+        stack = [0]
+        pos = 0
+        steps = 0
+
+        while True:
+            state = stack[-1]
+            current_token = tokens[pos]
+            steps += 1
+
+            entry = handoff.get((state, current_token))
+            if entry is not None:
+                cluster, level, nt, stops = entry
+                pos, engine_steps = self._expr(cluster, tokens, pos, level, stops, reductions)
+                steps += engine_steps
+                stack.append(goto_table[(state, nt)])
+                continue
+
+            action_key = (state, current_token)
+            if action_key not in action_table:
+                raise SyntaxError(f"No action for state {state} on {current_token}")
+
+            action = action_table[action_key]
+
+            if action[0] == 'shift':
+                stack.append(action[1])
+                pos += 1
+            elif action[0] == 'reduce':
+                production = action[1]
+                del stack[len(stack) - len(production[1]):]
+                reductions.append(production)
+
+                state = stack[-1]
+                goto_key = (state, production[0])
+                if goto_key not in goto_table:
+                    raise SyntaxError(f"No goto for state {state} on {production[0]}")
+                stack.append(goto_table[goto_key])
+            elif action[0] == 'accept':
+                return reductions, steps
+            else:
+                raise SyntaxError("Invalid action")
+
+    def _expr(self, cluster, tokens, pos, min_level, stops, reductions):
+        # 分析一个第 min_level 层的表达式，最外层遇到 stops 中的运算符时结束，返回 (新的位置, 步数)。
+        # 用显式的帧栈代替递归，嵌套再深也不会超出 Python 的递归深度：
+        # 表达式帧 [EXPR, 最低层, 左操作数当前所在层, 等右操作数分析完后归约的 (产生式, 层)]
+        # 初等式帧 [PRIMARY, 候选体, 产生式, 下一个要分析的符号下标]
+        primaries = cluster['primaries']
+        ops = cluster['ops']
+        chains = cluster['chains']
+        primary_level = cluster['primary_level']
+        steps = 0
+        frames = [[_EXPR, min_level, primary_level, None]]
+        enter_primary = True
+
+        while True:
+            if enter_primary:
+                steps += 1
+                entry = primaries.get(tokens[pos])
+                if entry is None:
+                    raise SyntaxError(f"Unexpected {tokens[pos]} at position {pos}")
+                frames.append([_PRIMARY, entry[0], entry[1], 0])
+                enter_primary = False
+
+            frame = frames[-1]
+            if frame[0] is _PRIMARY:
+                body = frame[1]
+                i = frame[3]
+                while i < len(body):
+                    symbol, level = body[i]
+                    i += 1
+                    if level is None:
+                        if tokens[pos] != symbol:
+                            raise SyntaxError(f"Expected {symbol}, got {tokens[pos]} at position {pos}")
+                        pos += 1
+                        continue
+                    frame[3] = i
+                    if level != primary_level:
+                        frames.append([_EXPR, level, primary_level, None])
+                    enter_primary = True
+                    break
+                else:
+                    frames.pop()
+                    reductions.append(frame[2])
+                continue
+
+            if frame[3] is not None:
+                # 右操作数分析完，归约这个二元运算
+                production, frame[2] = frame[3]
+                reductions.append(production)
+                frame[3] = None
+            steps += 1
+            info = ops.get(tokens[pos])
+            if info is None or info[0] < frame[1] or (len(frames) == 1 and tokens[pos] in stops):
+                reductions.extend(chains[frame[2]][frame[1]])
+                frames.pop()
+                if not frames:
+                    return pos, steps
+                continue
+            level, right, production = info
+            # 移进运算符之前，左操作数要先单位归约到该运算符要求的层
+            reductions.extend(chains[frame[2]][level + 1 if right else level])
+            frame[3] = (production, level)
+            frames.append([_EXPR, level if right else level + 1, primary_level, None])
+            pos += 1
+            enter_primary = True
+
@@ -1,5 +1,5 @@
-from LR0Item import LR0Item
-class SLR1Parser(LR0Item):
+from LR0Item import LR0Parser
+class SLR1Parser(LR0Parser):
     def build_action_table(self):
         action_table = {}
         follow = self.compute_follow()
@@ -0,0 +1,201 @@
+import random
+
+
+class SentenceGenerator:
+    # 按任意文法随机推导句子，词法单元逐个 yield，内存只与推导深度有关、与句子长度无关。
+    # 直接左递归 A -> A α | β 不展开成栈，而是先选重复次数 k，用一个计数帧生成 β α^k；
+    # 尾部自递归 A -> α A 同样处理，生成 α^k β。
+    INF = float('inf')
+
+    def __init__(self, grammar, seed=None, max_depth=30, target_length=100, growth=2.0):
+        self.grammar = grammar
+        self.random = random.Random(seed)
+        self.max_depth = max_depth  # 可以是整数，或 rng -> 整数 的函数
+        self.target_length = target_length  # 同上
+        self.growth = growth  # 长度不够时递归产生式相对其它产生式的权重
+        self.terminals = sorted(grammar.terminals)
+
+        self.min_len = self._compute_min_len()
+        self.min_height = self._compute_min_height()
+        recursive = self._compute_recursive()
+
+        if self.min_len[grammar.start_symbol] == self.INF:
+            raise ValueError(f"{grammar.start_symbol} cannot derive a terminal string")
+
+        # nt -> (基础候选 [(rhs, 最短长度)], 选择权重, 左递归尾部 [(α, 最短长度)], 最短尾部长度,
+        #        尾递归前缀 [(α, 最短长度)], 最短前缀长度, 长度最短的基础候选, 高度最低的基础候选)，
+        #        都预先算好，生成时不再重复计算。只为从开始符号经能终结的产生式可达的非终结符准备，
+        #        文法其余部分里不能终结的符号不影响生成
+        self.choices = {}
+        todo = [grammar.start_symbol]
+        while todo:
+            nt = todo.pop()
+            if nt in self.choices:
+                continue
+            base, weights, tails, prefixes = [], [], [], []
+            for prod in grammar.get_productions_for(nt):
+                rhs = [s for s in prod[1] if s != 'ε']
+                if self._seq_len(rhs) == self.INF:
+                    continue
+                if rhs and rhs[0] == nt:
+                    if len(rhs) > 1:
+                        tails.append((rhs[1:], self._seq_len(rhs[1:])))
+                elif rhs and rhs[-1] == nt:
+                    prefixes.append((rhs[:-1], self._seq_len(rhs[:-1])))
+                else:
+                    base.append((rhs, self._seq_len(rhs)))
+                    weights.append(self.growth if recursive(nt, rhs) else 1.0)
+                todo.extend(s for s in rhs if s in grammar.non_terminals and s not in self.choices)
+            shortest = min(length for _, length in base)
+            lowest = min(self._seq_height(rhs) for rhs, _ in base)
+            self.choices[nt] = (
+                base, weights, tails,
+                min((length for _, length in tails), default=0),
+                prefixes,
+                min((length for _, length in prefixes), default=0),
+                [entry for entry in base if entry[1] == shortest],
+                [entry for entry in base if self._seq_height(entry[0]) == lowest]
+            )
+
+    def tokens(self):
+        """生成一个合法句子的词法单元流"""
+        rng = self.random
+        max_depth = self._draw(self.max_depth)
+        target = self._draw(self.target_length)
+        non_terminals = self.grammar.non_terminals
+
+        # 帧：(符号, 深度) 或 (重复的候选 [(α, 最短长度)], 最短长度, 剩余重复次数, 深度)
+        stack = [(self.grammar.start_symbol, 0)]
+        pending = self.min_len[self.grammar.start_symbol]  # 栈上内容至少还会产生多少个词法单元
+        emitted = 0
+        while stack:
+            frame = stack.pop()
+            if len(frame) == 4:
+                repeats, shortest_repeat, k, depth = frame
+                alpha, length = rng.choice(repeats)
+                if k > 1:
+                    stack.append((repeats, shortest_repeat, k - 1, depth))
+                pending += length - shortest_repeat
+                for s in reversed(alpha):
+                    stack.append((s, depth + 1))
+                continue
+
+            symbol, depth = frame
+            if symbol not in non_terminals:
+                pending -= 1
+                emitted += 1
+                yield symbol
+                continue
+
+            choices = self.choices[symbol]
+            pending -= self.min_len[symbol]
+            remaining = target - emitted - pending
+            rhs, length = self._choose(choices, remaining, depth, max_depth)
+            tails, shortest_tail, prefixes, shortest_prefix = choices[2:6]
+            spare = remaining - length if depth < max_depth else 0
+            # 左递归的 α^k 在 β 之后，压在 β 下面；尾递归的 α^k 在 β 之前，压在 β 上面
+            k = self._repeat(tails, shortest_tail, spare)
+            if k:
+                stack.append((tails, shortest_tail, k, depth))
+                pending += k * shortest_tail
+                spare -= k * shortest_tail
+            pending += length
+            for s in reversed(rhs):
+                stack.append((s, depth + 1))
+            k = self._repeat(prefixes, shortest_prefix, spare)
+            if k:
+                stack.append((prefixes, shortest_prefix, k, depth))
+                pending += k * shortest_prefix
+
+    def sentence(self):
+        return list(self.tokens())
+
+    def near_miss_tokens(self):
+        """在合法句子上做一处删除/插入/替换，用来测出错路径的性能。绝大多数情况下结果不合法，但不做保证"""
+        rng = self.random
+        kind = rng.choice(('delete', 'insert', 'replace'))
+        target = self._draw(self.target_length)
+        at = rng.randint(0, max(0, target - 1))
+        done = False
+        for i, token in enumerate(self.tokens()):
+            if i == at:
+                done = True
+                if kind == 'insert':
+                    yield rng.choice(self.terminals)
+                    yield token
+                elif kind == 'replace':
+                    others = [t for t in self.terminals if t != token]
+                    yield rng.choice(others) if others else token
+                continue
+            yield token
+        if not done:
+            # 句子比预期短，改成在末尾追加
+            yield rng.choice(self.terminals)
+
+    def _choose(self, choices, remaining, depth, max_depth):
+        rng = self.random
+        base, weights, _, _, _, _, shortest, lowest = choices
+        if depth >= max_depth:
+            return rng.choice(lowest)
+        if remaining <= 0:
+            return rng.choice(shortest)
+        if remaining > 1:
+            # 还差得多时提高递归候选的权重：每层递归链平均约 sqrt(remaining) 长，嵌套几层即可达到目标长度
+            scale = remaining ** 0.5
+            weights = [w * scale if w != 1.0 else w for w in weights]
+        return rng.choices(base, weights)[0]
+
+    def _repeat(self, repeats, shortest, spare):
+        # 递归候选重复的次数，在还差的长度内均匀选取
+        if not repeats or spare <= 0:
+            return 0
+        return self.random.randint(0, int(spare) // max(1, shortest))
+
+    def _draw(self, value):
+        return value(self.random) if callable(value) else value
+
+    def _seq_len(self, rhs):
+        return sum(self.min_len.get(s, 1) for s in rhs)
+
+    def _seq_height(self, rhs):
+        return max((self.min_height[s] for s in rhs if s in self.min_height), default=0)
+
+    def _compute_min_len(self):
+        min_len = {nt: self.INF for nt in self.grammar.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.grammar.productions:
+                length = sum(min_len.get(s, 1) for s in rhs if s != 'ε')
+                if length < min_len[lhs]:
+                    min_len[lhs] = length
+                    changed = True
+        return min_len
+
+    def _compute_min_height(self):
+        height = {nt: self.INF for nt in self.grammar.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.grammar.productions:
+                h = 1 + max((height[s] for s in rhs if s in height), default=0)
+                if h < height[lhs]:
+                    height[lhs] = h
+                    changed = True
+        return height
+
+    def _compute_recursive(self):
+        reach = {}
+        for lhs, rhs in self.grammar.productions:
+            reach.setdefault(lhs, set()).update(s for s in rhs if s in self.grammar.non_terminals)
+        changed = True
+        while changed:
+            changed = False
+            for nt in reach:
+                extra = set()
+                for s in reach[nt]:
+                    extra |= reach.get(s, set())
+                if not extra <= reach[nt]:
+                    reach[nt] |= extra
+                    changed = True
+        return lambda nt, rhs: any(s == nt or nt in reach.get(s, ()) for s in rhs)
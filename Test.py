@@ -1,12 +1,20 @@
+import sys
 import time
+import asyncio
 import random
+from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
-from LR1Item import LR1Item
+from LR1Item import LR1Parser
 from LL1Parser import LL1Parser
-from LR0Item import  LR0Item
+from AdaptiveLLParser import AdaptiveLLParser
+from LR0Item import LR0Parser
 from LALR1Parser import LALR1Parser
 from SLR1Parser import  SLR1Parser
 from Grammar import Grammar as Grammar
+from ParseService import ParseService, run_load
+from SentenceGenerator import SentenceGenerator
+from PrecedenceParser import PrecedenceParser
+from ErrorRecovery import RecoveringLRParser, RecoveringLLParser
 
 
 
@@ -37,36 +45,410 @@ class ParserTester:
             ("F", ["id"])
         ], "E'")
 
-        # LL(1)适用的文法
-        self.ll1_grammar = Grammar([
-            ("E", ["T", "E'"]),
-            ("E'", ["+", "T", "E'"]),
-            ("E'", ["ε"]),
-            ("T", ["F", "T'"]),
-            ("T'", ["*", "F", "T'"]),
-            ("T'", ["ε"]),
-            ("F", ["(", "E", ")"]),
-            ("F", ["id"])
+        # LL(1)适用的文法：由基本表达式文法自动消除左递归、提取左公因子得到
+        self.ll1_grammar = self.expr_grammar.to_ll1()
+
+        # 非LL(1)文法：F 的三个候选都以 id 开头，需要自适应预测
+        self.llstar_grammar = Grammar(self.ll1_grammar.productions + [
+            ("F", ["id", "(", "E", ")"]),
+            ("F", ["id", "[", "E", "]"])
         ], "E")
 
-    def generate_test_cases(self, num_cases=10, max_depth=5):
-        """生成随机测试用例"""
-        self.test_cases = []
-        for _ in range(num_cases):
-            depth = random.randint(1, max_depth)
-            self.test_cases.append(self._generate_expr(depth))
+    def create_precedence_grammar(self, levels):
+        """创建有 levels 个优先级的表达式文法（已增广，开始符号为 S'）"""
+        productions = [("S'", ["E0"])]
+        for i in range(levels - 1):
+            productions.append((f"E{i}", [f"E{i}", f"op{i}", f"E{i + 1}"]))
+            productions.append((f"E{i}", [f"E{i + 1}"]))
+        productions.append((f"E{levels - 1}", ["(", "E0", ")"]))
+        productions.append((f"E{levels - 1}", ["id"]))
+        return Grammar(productions, "S'")
+
+    def run_incremental_benchmark(self, levels=8, rounds=3):
+        """比较增删产生式后 refresh() 与从头构造分析表的耗时，并校验两者结果一致"""
+        base = self.create_precedence_grammar(levels)
+        level = levels // 2
+        tail = Grammar._fresh_name(f"E{level}", set())
+        # 语句文法里加一种语句只改动少数状态；给表达式加一个新运算符则新的向前看符号会传到大多数 LR(1) 状态
+        statements = Grammar(
+            [("P", ["St", "P"]), ("P", ["St"])]
+            + [("St", [f"kw{i}", "E0", ";"]) for i in range(levels)]
+            + base.productions, "P")
+        targets = [
+            ("LL(1)", LL1Parser, base.to_ll1(), (tail, ["mod", f"E{level + 1}", tail]),
+             lambda p: [p.first, p.follow, p.parse_table]),
+            ("LALR(1)", LALR1Parser, base, (f"E{level}", [f"E{level}", "mod", f"E{level + 1}"]),
+             self.canonical_lr_tables),
+            ("LALR(1) st", LALR1Parser, statements, ("St", ["print", "id", ";"]), self.canonical_lr_tables),
+            # 删除后 "[" "]" 不再是终结符，不可达的旧状态里还留着 E -> [ E0 . ]，不能再对它们求闭包
+            ("LALR(1) []", LALR1Parser, base, (f"E{levels - 1}", ["[", "E0", "]"]), self.canonical_lr_tables)
+        ]
+        results = {}
+        for name, parser_class, grammar, edit, tables in targets:
+            grammar = Grammar(grammar.productions, grammar.start_symbol)
+            parser = parser_class(grammar)
+            refresh_times, rebuild_times, stale_counts = [], [], []
+            for _ in range(rounds):
+                for apply_edit in (grammar.add_production, grammar.remove_production):
+                    apply_edit(*edit)
+                    start = time.time()
+                    stale = parser.refresh()
+                    refresh_times.append(time.time() - start)
+                    stale_counts.append(stale if isinstance(stale, int) else len(stale))
+
+                    start = time.time()
+                    fresh = parser_class(Grammar(grammar.productions, grammar.start_symbol))
+                    rebuild_times.append(time.time() - start)
+                    if tables(fresh) != tables(parser):
+                        raise AssertionError(f"{name} incremental tables differ from a full rebuild")
+            results[name] = {
+                "refresh_time": sum(refresh_times) / len(refresh_times),
+                "rebuild_time": sum(rebuild_times) / len(rebuild_times),
+                "stale": max(stale_counts)
+            }
+
+        print(f"\nIncremental Edit Benchmark ({levels} precedence levels):")
+        print("{:<12} {:<15} {:<15} {:<10} {:<10}".format("Parser", "Refresh (s)", "Rebuild (s)", "Speedup", "Rebuilt"))
+        print("-" * 64)
+        for name, data in results.items():
+            print("{:<12} {:<15.6f} {:<15.6f} {:<10.1f} {:<10}".format(
+                name,
+                data["refresh_time"],
+                data["rebuild_time"],
+                data["rebuild_time"] / max(data["refresh_time"], 1e-9),
+                data["stale"]
+            ))
+        return results
+
+    @staticmethod
+    def canonical_lr_tables(parser):
+        """从状态 0 出发按符号顺序广度优先给状态重新编号，比较两个 LR 自动机时不受编号方式影响"""
+        successors = {}
+        for (src, symbol), dest in parser.goto_table.items():
+            successors.setdefault(src, []).append((symbol, dest))
+        numbering = {0: 0}
+        order = [0]
+        for state in order:
+            for _, dest in sorted(successors.get(state, ())):
+                if dest not in numbering:
+                    numbering[dest] = len(order)
+                    order.append(dest)
+        goto_table = {(numbering[src], symbol): numbering[dest] for (src, symbol), dest in parser.goto_table.items()}
+        action_table = {
+            (numbering[state], terminal): ('shift', numbering[action[1]]) if action[0] == 'shift' else action
+            for (state, terminal), action in parser.action_table.items()
+        }
+        return [len(parser.states), [parser.states[state] for state in order], goto_table, action_table]
+
+    def run_thread_scaling_benchmark(self, thread_counts=(1, 2, 4, 8), num_cases=200, max_depth=8):
+        """多个线程共享同一份编译后的 LALR(1) 表并发分析，比较不同线程数下的吞吐量"""
+        self.create_grammars()
+        tables = LALR1Parser(self.augmented_expr_grammar).compile()
+        test_cases = self.generate_test_cases(num_cases, max_depth)
+        total_tokens = sum(len(case) for case in test_cases)
+
+        def worker(cases):
+            session = tables.session()
+            for case in cases:
+                session.parse(case)
+
+        results = {}
+        for threads in thread_counts:
+            chunks = [test_cases[i::threads] for i in range(threads)]
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                start = time.time()
+                for future in [pool.submit(worker, chunk) for chunk in chunks]:
+                    future.result()
+                elapsed = time.time() - start
+            results[threads] = total_tokens / elapsed
+
+        gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+        print(f"\nThread Scaling Benchmark (shared LALR(1) tables, GIL {'enabled' if gil else 'disabled'}):")
+        print("{:<10} {:<18} {:<10}".format("Threads", "Tokens/s", "Scaling"))
+        print("-" * 40)
+        for threads, throughput in results.items():
+            print("{:<10} {:<18.0f} {:<10.2f}".format(threads, throughput, throughput / results[thread_counts[0]]))
+        return results
+
+    def run_service_benchmark(self, num_requests=2000, concurrency=16, max_depth=6, process_workers=0):
+        """在本机起一个 LALR(1) 分析服务，用压测客户端测每秒请求数和 p99 延迟"""
+        self.create_grammars()
+        requests = [" ".join(case) for case in self.generate_test_cases(num_requests, max_depth)]
+
+        async def bench():
+            service = ParseService(LALR1Parser(self.augmented_expr_grammar), process_workers=process_workers)
+            server = await service.start()
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await run_load(requests, concurrency, port=port)
+            finally:
+                await service.close()
+
+        stats = asyncio.run(bench())
+        print(f"\nService Benchmark ({concurrency} connections):")
+        print("{:<12} {:<12} {:<15} {:<15}".format("Requests", "Req/s", "p50 (ms)", "p99 (ms)"))
+        print("-" * 54)
+        print("{:<12} {:<12.0f} {:<15.3f} {:<15.3f}".format(
+            stats["requests"],
+            stats["requests_per_sec"],
+            stats["p50_latency"] * 1000,
+            stats["p99_latency"] * 1000
+        ))
+        return stats
+
+    def run_precedence_benchmark(self, level_counts=(10, 15, 20), num_cases=200, max_length=400, seed=0):
+        """在多层优先级文法上比较纯 LALR(1) 与嵌入优先级爬升后的步数和吞吐量"""
+        results = {}
+        for levels in level_counts:
+            grammar = self.create_precedence_grammar(levels)
+            lalr = LALR1Parser(grammar)
+            hybrid = PrecedenceParser(grammar)
+            generator = SentenceGenerator(grammar, seed=seed, max_depth=levels * 4,
+                                          target_length=lambda rng: rng.randint(1, max_length))
+            cases = [generator.sentence() for _ in range(num_cases)]
+            total_tokens = sum(len(case) for case in cases)
+
+            lr_steps = hybrid_steps = 0
+            for case in cases:
+                expected, steps = hybrid.parse_with_steps(case, use_precedence=False)
+                lr_steps += steps
+                reductions, steps = hybrid.parse_with_steps(case)
+                if reductions != expected:
+                    raise AssertionError("Precedence engine produced different reductions")
+                hybrid_steps += steps
+
+            start = time.time()
+            for case in cases:
+                lalr.parse(case)
+            lalr_time = time.time() - start
+
+            start = time.time()
+            for case in cases:
+                hybrid.parse(case)
+            hybrid_time = time.time() - start
+
+            results[levels] = {
+                "lalr_steps": lr_steps,
+                "hybrid_steps": hybrid_steps,
+                "lalr_throughput": total_tokens / lalr_time,
+                "hybrid_throughput": total_tokens / hybrid_time
+            }
+
+        print("\nPrecedence Climbing Benchmark:")
+        print("{:<8} {:<12} {:<12} {:<16} {:<16} {:<8}".format(
+            "Levels", "LALR steps", "Pratt steps", "LALR tokens/s", "Pratt tokens/s", "Speedup"))
+        print("-" * 76)
+        for levels, data in results.items():
+            print("{:<8} {:<12} {:<12} {:<16.0f} {:<16.0f} {:<8.1f}".format(
+                levels,
+                data["lalr_steps"],
+                data["hybrid_steps"],
+                data["lalr_throughput"],
+                data["hybrid_throughput"],
+                data["hybrid_throughput"] / data["lalr_throughput"]
+            ))
+        return results
+
+    def run_recovery_benchmark(self, num_cases=100, length=2000, errors_per_case=20, seed=0):
+        """错误恢复：合法输入上与普通分析比较耗时；多处出错的输入上比较一遍收集全部错误与“改一处、从头重分析”的耗时"""
+        rng = random.Random(seed)
+        generator = SentenceGenerator(self.expr_grammar, seed=seed, target_length=length)
+        valid = [generator.sentence() for _ in range(num_cases)]
+        broken = []
+        for case in valid:
+            case = list(case)
+            for _ in range(errors_per_case):
+                case.insert(rng.randrange(len(case) + 1), rng.choice(sorted(self.expr_grammar.terminals)))
+            broken.append(case)
+
+        results = {}
+        for name, parser, recovering in [
+            ("LL(1)", LL1Parser(self.ll1_grammar).compile(), RecoveringLLParser(LL1Parser(self.ll1_grammar))),
+            ("LALR(1)", LALR1Parser(self.expr_grammar).compile(), RecoveringLRParser(LALR1Parser(self.expr_grammar)))
+        ]:
+            start = time.time()
+            for case in valid:
+                parser.parse(case)
+            plain_time = time.time() - start
+
+            start = time.time()
+            for case in valid:
+                if recovering.parse(case):
+                    raise AssertionError("Recovery reported an error on a valid input")
+            valid_time = time.time() - start
+
+            start = time.time()
+            found = sum(len(recovering.parse(case)) for case in broken)
+            one_pass_time = time.time() - start
+
+            # 旧做法：每次只拿到第一个错误，删掉出错的词法单元后从头再分析
+            start = time.time()
+            for case in broken:
+                case = list(case)
+                session = parser.session()
+                while True:
+                    try:
+                        session.parse(case)
+                        break
+                    except SyntaxError:
+                        if session.pos >= len(case):
+                            break
+                        del case[session.pos]
+            rerun_time = time.time() - start
+
+            results[name] = {
+                "valid_overhead": valid_time / plain_time,
+                "errors_found": found,
+                "one_pass_time": one_pass_time,
+                "rerun_time": rerun_time
+            }
+
+        print(f"\nError Recovery Benchmark ({num_cases} inputs of ~{length} tokens, {errors_per_case} errors inserted):")
+        print("{:<10} {:<16} {:<14} {:<14} {:<14}".format(
+            "Parser", "Valid overhead", "Errors found", "One pass (s)", "Re-run (s)"))
+        print("-" * 68)
+        for name, data in results.items():
+            print("{:<10} {:<16.2f} {:<14} {:<14.4f} {:<14.4f}".format(
+                name, data["valid_overhead"], data["errors_found"], data["one_pass_time"], data["rerun_time"]))
+        return results
+
+    def run_budget_report(self, levels=12, max_states=60):
+        """LR(1) 构造的预算与回退：在状态数预算下分别用 abort/merge/lalr 构造，输出统计和迫使状态拆分的冲突"""
+        # 多层优先级文法让规范 LR(1) 的状态数成倍增长；再并入一个是 LR(1) 但不是 LALR(1) 的片段
+        productions = [p for p in self.create_precedence_grammar(levels).productions if p[0] != "S'"]
+        productions += [
+            ("Z", ["E0"]),
+            ("Z", ["S"]),
+            ("S", ["a", "A", "d"]),
+            ("S", ["b", "B", "d"]),
+            ("S", ["a", "B", "e"]),
+            ("S", ["b", "A", "e"]),
+            ("A", ["c"]),
+            ("B", ["c"])
+        ]
+        grammar = Grammar(productions, "Z")
+
+        results = {}
+        canonical = LR1Parser(grammar)
+        results["none"] = canonical.build_stats
+        for fallback in ("abort", "merge", "lalr"):
+            try:
+                parser = LR1Parser(grammar, max_states=max_states, fallback=fallback)
+                results[fallback] = parser.build_stats
+            except ValueError as e:
+                results[fallback] = {"error": str(e)}
+
+        print(f"\nLR(1) Construction Budget Report (max_states={max_states}):")
+        print("{:<10} {:<14} {:<10} {:<10} {:<12}".format("Fallback", "Strategy", "States", "Items", "Time (s)"))
+        print("-" * 56)
+        for fallback, stats in results.items():
+            if "error" in stats:
+                print("{:<10} {}".format(fallback, stats["error"]))
+                continue
+            print("{:<10} {:<14} {:<10} {:<10} {:<12.4f}".format(
+                fallback, stats["strategy"], stats["states"], stats["items"], stats["elapsed"]))
+        for conflict in results["merge"].get("split_conflicts", []):
+            print("Kept apart: {} / {} on {}".format(*conflict["items"], ", ".join(conflict["lookaheads"])))
+        return results
+
+    def run_simplification_report(self, grammar=None, inline=True):
+        """比较文法化简前后各 LR 分析器的状态数和表大小"""
+        if grammar is None:
+            # 带有不可达符号、不能终止的符号、重复产生式和只用一次的非终结符的表达式文法
+            grammar = Grammar([
+                ("E'", ["E"]),
+                ("E", ["E", "+", "T"]),
+                ("E", ["T"]),
+                ("E", ["H"]),
+                ("T", ["T", "*", "F"]),
+                ("T", ["F"]),
+                ("F", ["(", "E", ")"]),
+                ("F", ["(", "E", ")"]),
+                ("F", ["Atom"]),
+                ("Atom", ["id"]),
+                ("H", ["H", "id"]),
+                ("G", ["id", "G"]),
+                ("G", ["id"])
+            ], "E'")
+        simplified = grammar.simplify(inline=inline)
+
+        parsers = [
+            ("LR(0)", LR0Parser),
+            ("SLR(1)", SLR1Parser),
+            ("LR(1)", LR1Parser),
+            ("LALR(1)", LALR1Parser)
+        ]
+
+        def sizes(parser_class, g):
+            try:
+                parser = parser_class(g)
+            except ValueError as e:
+                return str(e)
+            return len(parser.states), len(parser.action_table), len(parser.goto_table)
+
+        print(f"\nGrammar Simplification Report ({len(grammar.productions)} -> "
+              f"{len(simplified.productions)} productions):")
+        print("{:<10} {:<24} {:<24}".format("Parser", "Before (states/act/goto)", "After (states/act/goto)"))
+        print("-" * 58)
+        results = {}
+        for name, parser_class in parsers:
+            before = sizes(parser_class, grammar)
+            after = sizes(parser_class, simplified)
+            results[name] = (before, after)
+            print("{:<10} {:<24} {:<24}".format(
+                name,
+                "/".join(map(str, before)) if isinstance(before, tuple) else before,
+                "/".join(map(str, after)) if isinstance(after, tuple) else after
+            ))
+        return simplified, results
+
+    def generate_test_cases(self, num_cases=10, max_depth=5, grammar=None, seed=None):
+        """生成随机测试用例（默认按基本表达式文法推导，一层表达式嵌套对应 E/T/F 三层推导）"""
+        generator = SentenceGenerator(
+            grammar or self.expr_grammar,
+            seed=seed,
+            max_depth=lambda rng: rng.randint(1, max_depth) * 3,
+            target_length=lambda rng: rng.randint(1, 2 ** max_depth)
+        )
+        self.test_cases = [generator.sentence() for _ in range(num_cases)]
         return self.test_cases
 
-    def _generate_expr(self, depth):
-        if depth == 0:
-            return ["id"]
-        choice = random.randint(0, 3)
-        if choice == 0:
-            return ["(", *self._generate_expr(depth - 1), ")"]
-        elif choice == 1:
-            return [*self._generate_expr(depth - 1), "+", *self._generate_expr(depth - 1)]
-        else:
-            return [*self._generate_expr(depth - 1), "*", *self._generate_expr(depth - 1)]
+    def run_throughput_benchmark(self, num_tokens=10 ** 6, num_invalid=200, seed=0):
+        """用流式生成的超长输入测 LALR(1) 吞吐量，同时测近似错误输入的出错路径"""
+        self.create_grammars()
+        session = LALR1Parser(self.augmented_expr_grammar).compile().session()
+        generator = SentenceGenerator(self.augmented_expr_grammar, seed=seed, max_depth=60,
+                                      target_length=num_tokens)
+
+        # 词法单元边生成边喂给分析器，整个输入从不完整地放进内存
+        count = 0
+        start = time.time()
+        for token in generator.tokens():
+            session.feed(token)
+            count += 1
+        session.finish()
+        valid_time = time.time() - start
+
+        generator.target_length = lambda rng: rng.randint(1, 1000)
+        invalid_tokens = 0
+        errors = 0
+        start = time.time()
+        for _ in range(num_invalid):
+            session.reset()
+            try:
+                for token in generator.near_miss_tokens():
+                    invalid_tokens += 1
+                    session.feed(token)
+                session.finish()
+            except SyntaxError:
+                errors += 1
+        invalid_time = time.time() - start
+
+        print("\nThroughput Benchmark (LALR(1), streamed input):")
+        print(f"valid:      {count} tokens in {valid_time:.3f}s, {count / valid_time:.0f} tokens/s")
+        print(f"near-miss:  {num_invalid} inputs, {errors} rejected, "
+              f"{invalid_tokens / invalid_time:.0f} tokens/s up to the error")
+        return count / valid_time, invalid_tokens / invalid_time
 
     def test_parser(self, parser_class, grammar, test_cases):
         """测试单个解析器"""
@@ -90,9 +472,10 @@ class ParserTester:
 
         parsers = [
             ("LL(1)", LL1Parser, self.ll1_grammar),
-            ("LR(0)", LR0Item, self.augmented_expr_grammar),
+            ("ALL(*)", AdaptiveLLParser, self.llstar_grammar),
+            ("LR(0)", LR0Parser, self.augmented_expr_grammar),
             ("SLR(1)", SLR1Parser, self.augmented_expr_grammar),
-            ("LR(1)", LR1Item, self.augmented_expr_grammar),
+            ("LR(1)", LR1Parser, self.augmented_expr_grammar),
             ("LALR(1)", LALR1Parser, self.augmented_expr_grammar)
         ]
 
@@ -131,4 +514,12 @@ class ParserTester:
 if __name__ == "__main__":
     tester = ParserTester()
     results = tester.run_comparison(num_cases=5, max_depth=3)  # 小规模测试
-    tester.print_results(results)
\ No newline at end of file
+    tester.print_results(results)
+    tester.run_incremental_benchmark()
+    tester.run_thread_scaling_benchmark()
+    tester.run_service_benchmark()
+    tester.run_throughput_benchmark()
+    tester.run_precedence_benchmark()
+    tester.run_simplification_report()
+    tester.run_recovery_benchmark()
+    tester.run_budget_report()
\ No newline at end of file